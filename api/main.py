@@ -3,12 +3,16 @@ api.py - Add ML file detection endpoint to existing API
 """
 
 import os
-from fastapi import Request, Query, BackgroundTasks, HTTPException, FastAPI
+import time
+import threading
+import json
+from fastapi import Request, Query, BackgroundTasks, HTTPException, FastAPI, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from rmr_agent.workflow import *
 from rmr_agent.utils import (
-    get_next_run_id, load_step_output, save_step_output,
+    get_next_run_id, load_step_output, load_step_outputs, save_step_output, write_file_atomically,
     log_component_corrections, log_dag_corrections,
     fork_and_clone_repo, parse_github_url  # Add these imports
 )
@@ -24,9 +28,19 @@ app = FastAPI()
 
 CHECKPOINT_BASE_PATH = os.environ.get("CHECKPOINT_BASE_PATH", "rmr_agent/checkpoints")
 
+# Seconds a finished run's state is kept in memory once idle; its checkpoints stay on disk (resume with run_id + start_from)
+WORKFLOW_STATE_TTL = int(os.environ.get("WORKFLOW_STATE_TTL", 86400))
+
 # In-memory storage for workflow states
 if 'workflow_states' not in globals():
     workflow_states: Dict[str, Dict[str, Any]] = {}
+    # Last time each (repo_name, run_id) state was touched, used for eviction
+    run_last_active: Dict[Tuple[str, str], float] = {}
+    # Per-run locks guarding read-modify-write sequences on a run's state
+    run_locks: Dict[Tuple[str, str], threading.Lock] = {}
+    run_locks_guard = threading.Lock()
+    # Last encoded /workflow-status body per run, with the state items it was encoded from
+    status_response_cache: Dict[Tuple[str, str], Tuple[Tuple[Tuple[str, Any], ...], bytes]] = {}
 
 # Add file detection cache
 if 'file_detection_cache' not in globals():
@@ -131,6 +145,58 @@ async def clear_detection_cache():
 
 # ============ The following are your existing endpoints, kept unchanged ============
 
+def get_run_lock(repo_name: str, run_id: str) -> threading.Lock:
+    with run_locks_guard:
+        return run_locks.setdefault((repo_name, run_id), threading.Lock())
+
+def touch_run(repo_name: str, run_id: str):
+    run_last_active[(repo_name, run_id)] = time.monotonic()
+
+def evict_stale_runs():
+    """Drop in-memory state of finished runs that have been idle for longer than WORKFLOW_STATE_TTL"""
+    cutoff = time.monotonic() - WORKFLOW_STATE_TTL
+    for (repo_name, run_id), last_active in list(run_last_active.items()):
+        if last_active > cutoff:
+            continue
+        with get_run_lock(repo_name, run_id):
+            # Re-check under the run's lock: the run may have been touched, resumed or evicted since the scan
+            last_active = run_last_active.get((repo_name, run_id))
+            if last_active is None or last_active > cutoff:
+                continue
+            runs = workflow_states.get(repo_name, {})
+            state = runs.get(run_id, {})
+            # Only finished runs can go; runs still executing or waiting for human feedback are kept
+            if state and state.get("step") != "complete" and state.get("status") not in ("failed", "cancelled"):
+                continue
+            runs.pop(run_id, None)
+            if not runs:
+                workflow_states.pop(repo_name, None)
+            run_last_active.pop((repo_name, run_id), None)
+            status_response_cache.pop((repo_name, run_id), None)
+        with run_locks_guard:
+            run_locks.pop((repo_name, run_id), None)
+        logger.info(f"Evicted idle workflow state for {repo_name} run {run_id}")
+
+def encode_run_state(repo_name: str, run_id: str) -> bytes:
+    """JSON-encode a run's state, reusing the previous body while no state value has been replaced.
+
+    State is only ever changed by assigning new values (state.update / item assignment), so identical
+    value objects mean identical content. The cached items keep those objects alive, so their ids
+    cannot be reused by new values.
+    """
+    with get_run_lock(repo_name, run_id):
+        items = tuple(workflow_states[repo_name][run_id].items())
+    cached = status_response_cache.get((repo_name, run_id))
+    if cached is not None and len(cached[0]) == len(items) and all(
+        key == cached_key and value is cached_value
+        for (key, value), (cached_key, cached_value) in zip(items, cached[0])
+    ):
+        return cached[1]
+    # Same encoding as FastAPI's JSONResponse, without walking the state through jsonable_encoder
+    body = json.dumps(dict(items), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    status_response_cache[(repo_name, run_id)] = (items, body)
+    return body
+
 def save_human_feedback(request: ComponentsResponse | DagResponse, repo_name: str, run_id: str, background_tasks: BackgroundTasks = None):
     # Save the human verification response
     if not run_id:
@@ -195,8 +261,7 @@ def save_human_feedback(request: ComponentsResponse | DagResponse, repo_name: st
             # IMPORTANT: Also save the verified DAG to dag.yaml file
             dag_yaml_path = os.path.join(CHECKPOINT_BASE_PATH, repo_name, run_id, "dag.yaml")
             try:
-                with open(dag_yaml_path, 'w') as yaml_file:
-                    yaml_file.write(request.verified_dag)
+                write_file_atomically(dag_yaml_path, request.verified_dag)
                 logger.info(f"Updated dag.yaml file with verified DAG at {dag_yaml_path}")
             except Exception as e:
                 logger.error(f"Error updating dag.yaml file: {e}")
@@ -223,8 +288,7 @@ def save_human_feedback(request: ComponentsResponse | DagResponse, repo_name: st
                         
                         # Save updated components back
                         components_data['verified_components'] = updated_components
-                        with open(components_path, 'w') as file:
-                            json.dump(components_data, file, indent=2)
+                        write_file_atomically(components_path, json.dumps(components_data, indent=2))
                         logger.info(f"Updated verified_components with renamed nodes")
                         
                 except Exception as e:
@@ -236,9 +300,11 @@ def save_human_feedback(request: ComponentsResponse | DagResponse, repo_name: st
     else:
         raise HTTPException(400, "Invalid request type for saving human feedback")
 
-    start_idx = STEPS.index((step_name, None))
+    start_idx = STEP_INDEX[step_name]
     # add update to our global state
-    workflow_states[repo_name][run_id].update(update)
+    with get_run_lock(repo_name, run_id):
+        workflow_states[repo_name][run_id].update(update)
+    touch_run(repo_name, run_id)
     # Save to checkpoints folder
     save_step_output(checkpoint_base_path=CHECKPOINT_BASE_PATH, repo_name=repo_name, run_id=run_id, step=step_name, output=update)
     start_idx += 1 # that is it for this step, just saving. Increment to move on to next step
@@ -249,42 +315,54 @@ def save_human_feedback(request: ComponentsResponse | DagResponse, repo_name: st
 def run_workflow_background(request: WorkflowRequest, repo_name: str, run_id: str, start_idx: int):
     # Get the global state
     state = workflow_states[repo_name][run_id]
-    state["step"] = STEPS[start_idx][0]
+    lock = get_run_lock(repo_name, run_id)
     try:
-        # Update state to show we're starting
-        state["status"] = "running"
-        
-        # Load from checkpoints folder all previous steps output
-        for step_name, _ in STEPS[:start_idx]:
+        # Update state to show we're starting, unless the run was cancelled before it got here
+        with lock:
             if state.get("status") == "cancelled":
-                logger.warning("Cancelling workflow while loading checkpoints")
+                logger.warning("Cancelling workflow before it started")
                 return
-            state.update(load_step_output(checkpoint_base_path=CHECKPOINT_BASE_PATH, repo_name=repo_name, run_id=run_id, step=step_name))
+            state["step"] = STEPS[start_idx][0]
+            state["status"] = "running"
+        
+        # Load from checkpoints folder all previous steps output (read in parallel, merged in step order)
+        previous_steps = [step_name for step_name, _ in STEPS[:start_idx]]
+        for step_output in load_step_outputs(checkpoint_base_path=CHECKPOINT_BASE_PATH, repo_name=repo_name, run_id=run_id, steps=previous_steps):
+            with lock:
+                if state.get("status") == "cancelled":
+                    logger.warning("Cancelling workflow while loading checkpoints")
+                    return
+                state.update(step_output)
         
         # Continue running the workflow starting from the provided start index
         for step_name, step_func in STEPS[start_idx:]:
-            if state.get("status") == "cancelled":
-                logger.warning(f"Cancelling workflow at step {step_name}")
-                return
-            state["step"] = step_name
+            with lock:
+                if state.get("status") == "cancelled":
+                    logger.warning(f"Cancelling workflow at step {step_name}")
+                    return
+                state["step"] = step_name
+            touch_run(repo_name, run_id)
             logger.info(f"Running step {step_name}")
             if step_name in HUMAN_STEPS:
                 break
             step_output = step_func(state)
             # Update global state
-            state.update(step_output)
+            with lock:
+                state.update(step_output)
             # Save to checkpoints folder
             save_step_output(checkpoint_base_path=CHECKPOINT_BASE_PATH, repo_name=repo_name, run_id=run_id, step=step_name, output=step_output)
             # await asyncio.sleep(1)
         else:
             # Loop completed without break - mark that we have successfully completed the entire workflow
-            if state.get("status") != "cancelled":
-                state["step"] = "complete"
+            with lock:
+                if state.get("status") != "cancelled":
+                    state["step"] = "complete"
 
     except Exception as e:
         # Handle any errors
-        state["status"] = "failed"
-        state["error"] = str(e)
+        with lock:
+            state["status"] = "failed"
+            state["error"] = str(e)
 
 @app.get("/")
 def read_root():
@@ -293,8 +371,11 @@ def read_root():
 @app.get("/workflow-status/{repo_name}")
 def get_workflow_status(
     repo_name: str,
-    run_id: str = Query(..., description="Run ID for continuing workflow")
+    run_id: str = Query(..., description="Run ID for continuing workflow"),
+    fields: Optional[str] = Query(None, description="Comma-separated state fields to return (e.g. 'step,status,error'); the full state when omitted")
 ):
+    evict_stale_runs()
+
     # Check if the workflow exists
     if repo_name not in workflow_states:
         raise HTTPException(status_code=404, detail=f"Workflow with repo_name {repo_name} not found")
@@ -303,9 +384,20 @@ def get_workflow_status(
     if run_id not in workflow_states[repo_name]:
         raise HTTPException(status_code=404, detail=f"Run ID {run_id} not found in repository {repo_name}")
 
+    # Touch under the run's lock, so a concurrent eviction either sees the touch or has already removed the run
+    with get_run_lock(repo_name, run_id):
+        if run_id not in workflow_states.get(repo_name, {}):
+            raise HTTPException(status_code=404, detail=f"Run ID {run_id} not found in repository {repo_name}")
+        touch_run(repo_name, run_id)
+
     # Return the current state for this specific run
     logger.info(f"Returning status update with current step: {workflow_states[repo_name][run_id]['step']}")
-    return workflow_states[repo_name][run_id]
+    if fields:
+        # Progress polling only needs a few small fields, not the code and summaries
+        state = workflow_states[repo_name][run_id]
+        with get_run_lock(repo_name, run_id):
+            return {name: state[name] for name in map(str.strip, fields.split(",")) if name in state}
+    return Response(content=encode_run_state(repo_name, run_id), media_type="application/json")
 
 @app.get("/correction-logs/{repo_name}")
 def get_correction_logs(
@@ -344,7 +436,8 @@ def cancel_workflow(
         raise HTTPException(status_code=404, detail=f"Run ID {run_id} not found in repository {repo_name}")
     
     # Set cancellation flag in the state
-    workflow_states[repo_name][run_id]["status"] = "cancelled"
+    with get_run_lock(repo_name, run_id):
+        workflow_states[repo_name][run_id]["status"] = "cancelled"
     
     return {"status": "cancelled", "message": f"Workflow has been cancelled for run_id {run_id} for repo_name {repo_name}"}
 
@@ -364,17 +457,23 @@ async def run_workflow_endpoint(
     if "verified_dag" in payload:
         logger.info("🧩 Detected: DagResponse")
         parsed = DagResponse(**payload)
-        workflow_states[repo_name][run_id]["step"] = "human_verification_of_dag"
-        workflow_states[repo_name][run_id]["status"] = "saving_feedback"
-        return save_human_feedback(parsed, repo_name, run_id, background_tasks)
+        if run_id not in workflow_states.get(repo_name, {}):
+            raise HTTPException(status_code=404, detail=f"Run ID {run_id} not found in repository {repo_name}")
+        with get_run_lock(repo_name, run_id):
+            workflow_states[repo_name][run_id].update(step="human_verification_of_dag", status="saving_feedback")
+        # Loads checkpoints, diffs corrections and writes files - keep it off the event loop
+        return await run_in_threadpool(save_human_feedback, parsed, repo_name, run_id, background_tasks)
 
     # === Component Feedback ===
     elif "verified_components" in payload:
         logger.info("🧩 Detected: ComponentsResponse")
         parsed = ComponentsResponse(**payload)
-        workflow_states[repo_name][run_id]["step"] = "human_verification_of_components"
-        workflow_states[repo_name][run_id]["status"] = "saving_feedback"
-        return save_human_feedback(parsed, repo_name, run_id, background_tasks)
+        if run_id not in workflow_states.get(repo_name, {}):
+            raise HTTPException(status_code=404, detail=f"Run ID {run_id} not found in repository {repo_name}")
+        with get_run_lock(repo_name, run_id):
+            workflow_states[repo_name][run_id].update(step="human_verification_of_components", status="saving_feedback")
+        # Loads checkpoints, diffs corrections and writes files - keep it off the event loop
+        return await run_in_threadpool(save_human_feedback, parsed, repo_name, run_id, background_tasks)
 
     # === Workflow Init / Start ===
     elif "github_url" in payload and "input_files" in payload:
@@ -383,15 +482,13 @@ async def run_workflow_endpoint(
 
         # Start or continue workflow
         run_id = parsed.run_id or get_next_run_id(checkpoint_base_path=CHECKPOINT_BASE_PATH, repo_name=repo_name)
-        start_idx = 0 if not parsed.start_from else next(i for i, (s, _) in enumerate(STEPS) if s == parsed.start_from)
+        start_idx = 0 if not parsed.start_from else STEP_INDEX[parsed.start_from]
         step_name = STEPS[start_idx][0]
         status = "initializing"
 
         # Initialize the workflow state
-        if repo_name not in workflow_states:
-            workflow_states[repo_name] = {}
-        workflow_states[repo_name][run_id] = INITIAL_STATE.copy()
-        state = workflow_states[repo_name][run_id]
+        evict_stale_runs()
+        state = INITIAL_STATE.copy()
         state["step"] = step_name
         state["status"] = status
         state["github_url"] = parsed.github_url
@@ -401,6 +498,11 @@ async def run_workflow_endpoint(
         if parsed.existing_config_path:
             state["existing_config_path"] = parsed.existing_config_path
             logger.info(f"Setting config file path: {parsed.existing_config_path}")
+        # Publish the fully built state under the run's lock; setdefault so two concurrent
+        # starts for the same repo don't replace each other's runs
+        with get_run_lock(repo_name, run_id):
+            workflow_states.setdefault(repo_name, {})[run_id] = state
+            touch_run(repo_name, run_id)
 
         # Add background task to run
         background_tasks.add_task(run_workflow_background, parsed, repo_name, run_id, start_idx)
@@ -1,19 +1,19 @@
 
 
 import os
-import sys
 import streamlit as st
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 from datetime import datetime
 from rmr_agent.utils import parse_github_url
-from rmr_agent.workflow import STEPS, HUMAN_STEPS
+from rmr_agent.workflow import STEPS, STEP_INDEX, HUMAN_STEPS
 from frontend.ui_utils import (
-    clean_file_path, remove_line_numbers, clean_line_range,
+    clean_file_path, prepare_code_display, clean_line_range,
     get_components, get_cleaned_code, get_dag_yaml, show_rmr_agent_results,
     get_default_line_range, get_steps_could_start_from,
-    dag_edge_editor
+    dag_edge_editor, load_component_definitions
 )
 from rmr_agent.utils.logging_config import setup_logger
 
@@ -21,8 +21,26 @@ from rmr_agent.utils.logging_config import setup_logger
 logger = setup_logger(__name__)
 
 BASE_URL = os.environ.get("RMR_AGENT_API_BASE_URL", "http://localhost:8000")
+# Only these state fields are used while polling; skip transferring code and summaries
+STATUS_FIELDS = "step,status,error,repo_name,run_id"
+# Status polling starts fast after a step change and backs off while the step is unchanged
+MIN_POLL_INTERVAL = 0.2
+MAX_POLL_INTERVAL = 5.0
+
+
+
+@st.cache_resource
+def get_api_session() -> requests.Session:
+    """HTTP session shared across reruns so API calls and status polls reuse pooled keep-alive connections"""
+    session = requests.Session()
+    # Retries only apply to idempotent requests (status polls), not to POSTs that start work
+    retries = Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
-sys.stdout.flush()
 # Maximize layout width
 st.set_page_config(layout="wide")
 
@@ -62,6 +80,8 @@ if "edited_components_list" not in st.session_state:
     st.session_state["edited_components_list"] = []
 if 'last_status' not in st.session_state:
     st.session_state["last_status"] = None
+if "poll_interval" not in st.session_state:
+    st.session_state["poll_interval"] = MIN_POLL_INTERVAL
 
 
 def detect_ml_files_via_api(github_url):
@@ -69,7 +89,7 @@ def detect_ml_files_via_api(github_url):
     try:
         # Call the new detection endpoint
         with st.spinner("🔍 Analyzing repository structure and detecting ML pipeline files..."):
-            response = requests.post(
+            response = get_api_session().post(
                 f"{BASE_URL}/detect-ml-files",
                 json={"github_url": github_url}
             )
@@ -297,7 +317,7 @@ def start_workflow():
         url += f"&run_id={st.session_state['run_id']}"
 
     with st.spinner("Starting workflow..."):
-        response = requests.post(url, json=payload)
+        response = get_api_session().post(url, json=payload)
     
     if response.status_code == 200:
         try:
@@ -322,17 +342,18 @@ def start_workflow():
 def check_workflow_status():
     """Function to poll for the current workflow status"""
     try:
-        response = requests.get(
-            f"{BASE_URL}/workflow-status/{st.session_state['repo_name']}?run_id={st.session_state.run_id}"
+        response = get_api_session().get(
+            f"{BASE_URL}/workflow-status/{st.session_state['repo_name']}?run_id={st.session_state.run_id}&fields={STATUS_FIELDS}"
         )
 
-        logger.debug(f"Status code: {response.status_code}")
+        logger.debug("Status code: %s", response.status_code)
 
         if response.status_code == 200:
             data = response.json()
             status = data.get("status")
             current_step = data.get("step")
-            logger.info(f"{datetime.now().strftime('%H:%M:%S')} Poll API returned - Status: {status}, Step: {current_step}")
+            # Logged at debug level: this runs on every poll, step changes are logged below
+            logger.debug("Poll API returned - Status: %s, Step: %s", status, current_step)
 
             step_changed = False
             prev_step = st.session_state.get("current_step", "")
@@ -365,12 +386,25 @@ def check_workflow_status():
         st.warning(f"Error checking workflow status: {e}")
 
 
+def poll_workflow_status():
+    """Poll the workflow status once the backoff interval has passed; rerun the whole page when the step changes"""
+    # The fragment ticks at MIN_POLL_INTERVAL and skips ticks until the backed-off poll interval has passed
+    if time.monotonic() - st.session_state.get("last_poll_time", 0.0) < st.session_state["poll_interval"]:
+        return
+    st.session_state["last_poll_time"] = time.monotonic()
+    step_changed = check_workflow_status()
+    if step_changed or not st.session_state.workflow_running:
+        st.session_state["poll_interval"] = MIN_POLL_INTERVAL
+        st.rerun()
+    st.session_state["poll_interval"] = min(st.session_state["poll_interval"] * 1.5, MAX_POLL_INTERVAL)
+
+
 def submit_human_feedback(payload, repo_name, run_id):
     url = f"{BASE_URL}/run-workflow/?repo_name={repo_name}&run_id={run_id}"
     logger.info(f"Submitting human feedback to: {url}")
     logger.debug(f"Feedback payload: {payload}")
 
-    response = requests.post(url, json=payload)
+    response = get_api_session().post(url, json=payload)
     logger.info(f"Submit Status: {response.status_code}")
     logger.debug(f"Response: '{response.text}'")
     if response.status_code == 200:
@@ -399,11 +433,11 @@ def submit_human_feedback(payload, repo_name, run_id):
 
 
 def display_progress_bar(current_step, write_cur_step=True):
-    if current_step not in STEPS:
+    current_step_idx = STEP_INDEX.get(current_step)
+    if current_step_idx is None:
         return 
     # Calculate progress based on current step position
     total_steps = len(STEPS)
-    current_step_idx = STEPS.index(current_step)
     if current_step == "complete":
         completed_steps = total_steps
     else:
@@ -417,13 +451,13 @@ def display_progress_bar(current_step, write_cur_step=True):
 
 
 def display_detailed_progress(current_step):
-    if current_step not in STEPS:
+    current_step_idx = STEP_INDEX.get(current_step)
+    if current_step_idx is None:
         return
     # Sidebar: Detailed step list
     if "sidebar_placeholder" not in st.session_state:
         st.session_state["sidebar_placeholder"] = st.sidebar.empty()
     markdown_content = "### Workflow Steps\n\n"  # Plain text header
-    current_step_idx = STEPS.index(current_step)
     for idx, step in enumerate(STEPS):
         if idx < current_step_idx:
             status_icon = "✅"
@@ -449,7 +483,7 @@ def cancel_workflow_button():
         # Make API call to cancel the workflow
         cancel_url = f"{BASE_URL}/cancel-workflow/{st.session_state['repo_name']}?run_id={st.session_state['run_id']}"
         try:
-            cancel_response = requests.post(cancel_url)
+            cancel_response = get_api_session().post(cancel_url)
             
             if cancel_response.status_code == 200:
                 st.session_state.workflow_running = False
@@ -504,8 +538,7 @@ def back_to_home_button(key="back_to_home"):
 
 def human_verification_of_components_ui(repo_name, run_id):
     # Load available ML components with their descriptions
-    with open("rmr_agent/ml_components/component_definitions.json", 'r') as file:
-        ml_components = json.load(file)
+    ml_components = load_component_definitions()
 
     # Display all ML component descriptions as a reference
     st.sidebar.subheader("Descriptions for Available ML Components")
@@ -560,14 +593,12 @@ def human_verification_of_components_ui(repo_name, run_id):
 
         cleaned_file_name = clean_file_path(file_name, repo_name)
 
+        # Code that will be displayed
         if file_name in cleaned_code:
-            code_lines = cleaned_code[file_name].splitlines()
+            code_display, numbered_code = prepare_code_display(cleaned_code[file_name])
         else:
             st.error(f"file_name = {file_name} not found in cleaned_code dict, keys = {list(cleaned_code.keys())}")
- 
-        # Code that will be displayed
-        code_display = code_lines if file_name in cleaned_code else []
-        code_display = remove_line_numbers(code_display)
+            code_display, numbered_code = [], ""
  
         # Existing component names for this file
         existing_component_names = list(current_components_dict.keys())
@@ -690,7 +721,6 @@ def human_verification_of_components_ui(repo_name, run_id):
                 st.write(f"**Cleaned Code For This File** ({len(code_display)} lines):")
                 container = st.container(height=600)
                 with container:
-                    numbered_code = "\n".join(f"{i+1}: {line}" for i, line in enumerate(code_display))
                     st.code(numbered_code, language="python")
             else:
                 st.error("Could not display code for this file")
@@ -767,25 +797,16 @@ def main():
     elif st.session_state.workflow_running:
         cancel_workflow_button()
         st.write(f"Run ID: **{st.session_state['run_id']}**")
-        with st.status(f"**Running {st.session_state['current_step'].replace('_', ' ').title()}** ...", expanded=True, state="running") as status:
+        label_str = f"**Running {st.session_state['current_step'].replace('_', ' ').title()}** ..."
+        if st.session_state["current_step"] == "code_editor_agent":
+            label_str += " This step may take a while, please be patient."
+        with st.status(label_str, expanded=True, state="running"):
+            display_progress_bar(st.session_state["current_step"], write_cur_step=False)
             display_detailed_progress(st.session_state["current_step"])
-            while st.session_state.workflow_running:
-                step_changed = False
-                while not step_changed:
-                    # Poll every 2 seconds
-                    step_changed = check_workflow_status()
-                    time.sleep(2)
-                # update the status with the new step
-                label_str = f"Running {st.session_state['current_step'].replace('_', ' ').title()} ..."
-                if st.session_state["current_step"] == "code_editor_agent":
-                    label_str += " This step may take a while, please be patient."
-                status.update(label=label_str, state="running")
-                display_progress_bar(st.session_state["current_step"], write_cur_step=False)
-                display_detailed_progress(st.session_state["current_step"])
-                current_time = datetime.now().strftime("%H:%M:%S")
-                logger.debug(f"Displayed - Last updated: {current_time}, Running step: {st.session_state['current_step']}")
-        
-        st.rerun()
+            current_time = datetime.now().strftime("%H:%M:%S")
+            logger.debug(f"Displayed - Last updated: {current_time}, Running step: {st.session_state['current_step']}")
+            # Poll on a timer as a fragment, so the script thread is free between polls and Cancel responds immediately
+            st.fragment(poll_workflow_status, run_every=MIN_POLL_INTERVAL)()
 
     # Handle human verification steps and workflow completion
     else: 
@@ -17,6 +17,7 @@ from streamlit import rerun
 from streamlit_mermaid import st_mermaid
 import streamlit.components.v1 as components
 from rmr_agent.utils.logging_config import setup_logger
+from rmr_agent.utils.response_parsing import SafeLoader
 
 # Set up module logger
 logger = setup_logger(__name__)
@@ -53,6 +54,14 @@ def remove_line_numbers(code_lines: List[str]) -> List[str]:
     return [line.split('|')[-1] for line in code_lines]
 
 
+@st.cache_data(max_entries=64, show_spinner=False)
+def prepare_code_display(code: str) -> Tuple[List[str], str]:
+    """Split cleaned code into display lines and the numbered listing, cached per file content across reruns."""
+    code_display = remove_line_numbers(code.splitlines())
+    numbered_code = "\n".join(f"{i+1}: {line}" for i, line in enumerate(code_display))
+    return code_display, numbered_code
+
+
 def clean_line_range(line_range: str) -> str:
     """Clean and normalize line range string."""
     return line_range.lower().split('lines')[-1].strip()
@@ -62,12 +71,32 @@ def clean_line_range(line_range: str) -> str:
 # DATA LOADING FUNCTIONS
 # ============================================================================
 
+# Checkpoint readers run on every Streamlit rerun (each click and keystroke). Parsed files are cached
+# keyed by path and modification time, so a rewritten checkpoint is picked up on the next rerun.
+@st.cache_data(max_entries=32, show_spinner=False)
+def _load_json_checkpoint(file_path: str, mtime_ns: int) -> Any:
+    with open(file_path, 'r') as file:
+        return json.load(file)
+
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _read_text_checkpoint(file_path: str, mtime_ns: int) -> str:
+    with open(file_path, 'r') as file:
+        return file.read()
+
+
+@st.cache_resource
+def load_component_definitions() -> Dict[str, str]:
+    """Load the static ML component descriptions (shared, do not mutate)."""
+    with open("rmr_agent/ml_components/component_definitions.json", 'r') as file:
+        return json.load(file)
+
+
 def get_components(repo_name: str, run_id: str) -> List[Dict]:
     """Load component parsing results from checkpoint."""
     try:
         file_path = os.path.join(CHECKPOINT_BASE_PATH, repo_name, run_id, 'component_parsing.json')
-        with open(file_path, 'r') as file:
-            content = json.load(file)
+        content = _load_json_checkpoint(file_path, os.stat(file_path).st_mtime_ns)
         return content['component_parsing']
     except FileNotFoundError:
         raise FileNotFoundError(f"Component parsing file not found for repo: {repo_name}, run_id: {run_id}")
@@ -81,8 +110,7 @@ def get_verified_components(repo_name: str, run_id: str) -> List[Dict]:
     """Get verified components from human verification step if available."""
     try:
         file_path = os.path.join(CHECKPOINT_BASE_PATH, repo_name, run_id, 'human_verification_of_components.json')
-        with open(file_path, 'r') as file:
-            content = json.load(file)
+        content = _load_json_checkpoint(file_path, os.stat(file_path).st_mtime_ns)
         return content.get('verified_components', [])
     except (FileNotFoundError, json.JSONDecodeError, IOError):
         # Fall back to original components
@@ -98,8 +126,7 @@ def get_component_details_from_verified(repo_name: str, run_id: str) -> Dict[str
     """
     try:
         file_path = os.path.join(CHECKPOINT_BASE_PATH, repo_name, run_id, 'human_verification_of_components.json')
-        with open(file_path, 'r') as file:
-            content = json.load(file)
+        content = _load_json_checkpoint(file_path, os.stat(file_path).st_mtime_ns)
         verified_components = content.get('verified_components', [])
     except (FileNotFoundError, json.JSONDecodeError, IOError) as e:
         logger.warning(f"Could not load verified components: {e}")
@@ -133,8 +160,7 @@ def get_cleaned_code(repo_name: str, run_id: str) -> Dict[str, str]:
     """Load cleaned code from summarization step."""
     try:
         file_path = os.path.join(CHECKPOINT_BASE_PATH, repo_name, run_id, 'summarize.json')
-        with open(file_path, 'r') as file:
-            content = json.load(file)
+        content = _load_json_checkpoint(file_path, os.stat(file_path).st_mtime_ns)
         return content['cleaned_code']
     except FileNotFoundError:
         raise FileNotFoundError(f"Summarize file not found for repo: {repo_name}, run_id: {run_id}")
@@ -150,8 +176,7 @@ def get_dag_yaml(repo_name: str, run_id: str) -> str:
     """Load DAG YAML from checkpoint."""
     try:
         file_path = os.path.join(CHECKPOINT_BASE_PATH, repo_name, run_id, 'dag.yaml')
-        with open(file_path, 'r') as file:
-            dag_yaml_str = file.read()
+        dag_yaml_str = _read_text_checkpoint(file_path, os.stat(file_path).st_mtime_ns)
         logger.info("Successfully loaded dag.yaml")
         return dag_yaml_str
     except FileNotFoundError:
@@ -308,7 +333,7 @@ def parse_dag_edges_from_yaml(
     Returns:
         Tuple of (edges, nodes)
     """
-    data = yaml.safe_load(dag_yaml)
+    data = yaml.load(dag_yaml, Loader=SafeLoader)
     if not isinstance(data, dict):
         raise ValueError("Parsed YAML is not a dictionary.")
 
@@ -1,17 +1,119 @@
+import os
+import re
 import json
-import litellm
+import functools
 import logging
 from rmr_agent.llms import LLMClient
-from rmr_agent.utils import convert_to_dict, preprocess_python_file
+from rmr_agent.utils import convert_to_dict, preprocess_python_file, JsonObjectTracker
 from rmr_agent.utils.logging_config import setup_logger
 
 # Set up module logger
 logger = setup_logger(__name__)
 
+_PARSE_PROMPT_STATIC = """You are tasked with reviewing and correcting a JSON string that represents identified ML components from a Python file in an ML pipeline. You will produce a valid, accurate JSON output.
+
+### Instructions:
+    1. Parse the JSON String:
+        - Read the input JSON string containing ML components, each with details like line ranges, evidence for this component being identified, and why it is separate from other identified components.
+    2. Ensure Each Component Has a Merged Line Range:
+        - If a component's line range shows multiple ranges, merge all line ranges into a single range using the minimum start value and maximum end value (e.g., '258-311' for '258-287, 300-311'), even if there are gaps.
+    3. Keep all "quote_or_paraphrase" and "support_reason" items for each component in your output, as well as the "why_separate" section if present (otherwise set to null).
+    4. **Identify Overlapping Line Ranges**: 
+        - Compare the merged line ranges of all components to identify overlaps.
+    5. **Resolve Overlaps**:
+        - For each identified line range overlap:
+            - If one component’s line range is fully contained in another componet's line range, keep the larger one.
+            - If partial overlap occurs, keep the component with stronger classification evidence matching it's component definition
+        - Ensure there is at least one component left - do not remove them all. 
+
+### Response Format (JSON):
+{
+  "<ML_COMPONENT_NAME_HERE>": { 
+    "line_range": "<MERGED_NON_OVERLAPPING_LINE_RANGE>", // Example: "0-49", "55-72"
+    "evidence": [
+      {
+        "quote_or_paraphrase": "<RELEVANT_QUOTE_OR_PARAPHRASE_1>",
+        "support_reason": "<EXPLANATION_WHY_EVIDENCE_1_SUPPORTS_THIS_COMPONENT>"
+      },
+      {
+        "quote_or_paraphrase": "<RELEVANT_QUOTE_OR_PARAPHRASE_2>",
+        "support_reason": "<EXPLANATION_WHY_EVIDENCE_2_SUPPORTS_THIS_COMPONENT>"
+      },
+      {
+        "quote_or_paraphrase": "<RELEVANT_QUOTE_OR_PARAPHRASE_3>",
+        "support_reason": "<EXPLANATION_WHY_EVIDENCE_3_SUPPORTS_THIS_COMPONENT>"
+      }
+    ],
+    "why_this_is_separate": "<JUSTIFICATION_FOR_THIS_COMPONENT_BEING_SEPARATE_AND_VERIFICATION_OF_NOT_OVERLAPPING>"
+    }
+}
+
+"""
+
 def retry_component_identification(python_file_path, full_file_list, code_summary, model="gpt-4o", temperature=0, max_tokens=2048, 
                  frequency_penalty=0, presence_penalty=0):
     pass
 
+@functools.lru_cache(maxsize=1024)
+def _file_line_count(file_path, mtime):
+    """Number of lines in the cleaned code of a file. mtime is part of the cache key so edits invalidate it."""
+    return len(preprocess_python_file(file_path).splitlines())
+
+_LINE_SPAN_RE = re.compile(r"(\d+)\s*[-:–]\s*(\d+)")
+
+def _parse_line_range(line_range):
+    """
+    Return the sorted, merged (start, end) intervals of a line range string like "Lines 10-50"
+    or "10-20, 30-40", or None if it holds no start-end pair.
+    """
+    if not isinstance(line_range, str):
+        return None
+    intervals = sorted((min(int(a), int(b)), max(int(a), int(b))) for a, b in _LINE_SPAN_RE.findall(line_range))
+    if not intervals:
+        return None
+    merged = [intervals[0]]
+    for start, end in intervals[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return tuple(merged)
+
+def _intervals_contained(inner, outer):
+    """Whether every interval of inner lies within a single interval of outer."""
+    return all(
+        any(outer_start <= start and end <= outer_end for outer_start, outer_end in outer)
+        for start, end in inner
+    )
+
+def drop_contained_components(parsed_dict):
+    """
+    Remove components whose line ranges are fully covered by another component's ranges,
+    keeping the larger one. Components per file are few, so a pairwise scan is cheapest.
+    For identical ranges the first component wins.
+    """
+    spans = {}
+    for component, metadata in parsed_dict.items():
+        span = _parse_line_range(metadata.get('line_range'))
+        if span:
+            spans[component] = span
+
+    names = list(spans)
+    contained = set()
+    for i, inner in enumerate(names):
+        for j, outer in enumerate(names):
+            if i == j or outer in contained:
+                continue
+            if _intervals_contained(spans[inner], spans[outer]) and (spans[inner] != spans[outer] or j < i):
+                contained.add(inner)
+                break
+
+    for component in contained:
+        logger.info("Dropping component %s: line range %s is contained in another component", component, parsed_dict[component].get('line_range'))
+        del parsed_dict[component]
+    return parsed_dict
+
 def get_relevant_component_definitions(component_identification_response):
     try:
         # Convert the JSON response into a Python dictionary
@@ -58,65 +160,38 @@ def parse_component_identification(component_identification_response, file):
     """
     relevant_component_definitions = get_relevant_component_definitions(component_identification_response)
 
-    parse_prompt = f"""You are tasked with reviewing and correcting a JSON string that represents identified ML components from a Python file in an ML pipeline. You will produce a valid, accurate JSON output.
-
-### Instructions:
-    1. Parse the JSON String:
-        - Read the input JSON string containing ML components, each with details like line ranges, evidence for this component being identified, and why it is separate from other identified components.
-    2. Ensure Each Component Has a Merged Line Range:
-        - If a component's line range shows multiple ranges, merge all line ranges into a single range using the minimum start value and maximum end value (e.g., '258-311' for '258-287, 300-311'), even if there are gaps.
-    3. Keep all "quote_or_paraphrase" and "support_reason" items for each component in your output, as well as the "why_separate" section if present (otherwise set to null).
-    4. **Identify Overlapping Line Ranges**: 
-        - Compare the merged line ranges of all components to identify overlaps.
-    5. **Resolve Overlaps**:
-        - For each identified line range overlap:
-            - If one component’s line range is fully contained in another componet's line range, keep the larger one.
-            - If partial overlap occurs, keep the component with stronger classification evidence matching it's component definition
-        - Ensure there is at least one component left - do not remove them all. 
-
-### Response Format (JSON):
-{{
-  "<ML_COMPONENT_NAME_HERE>": {{ 
-    "line_range": "<MERGED_NON_OVERLAPPING_LINE_RANGE>", // Example: "0-49", "55-72"
-    "evidence": [
-      {{
-        "quote_or_paraphrase": "<RELEVANT_QUOTE_OR_PARAPHRASE_1>",
-        "support_reason": "<EXPLANATION_WHY_EVIDENCE_1_SUPPORTS_THIS_COMPONENT>"
-      }},
-      {{
-        "quote_or_paraphrase": "<RELEVANT_QUOTE_OR_PARAPHRASE_2>",
-        "support_reason": "<EXPLANATION_WHY_EVIDENCE_2_SUPPORTS_THIS_COMPONENT>"
-      }},
-      {{
-        "quote_or_paraphrase": "<RELEVANT_QUOTE_OR_PARAPHRASE_3>",
-        "support_reason": "<EXPLANATION_WHY_EVIDENCE_3_SUPPORTS_THIS_COMPONENT>"
-      }}
-    ],
-    "why_this_is_separate": "<JUSTIFICATION_FOR_THIS_COMPONENT_BEING_SEPARATE_AND_VERIFICATION_OF_NOT_OVERLAPPING>"
-    }}
-}}
-
-### Component Identification Response:
-{component_identification_response}
-
-### Component Definitions To Help Resolve Overlaps:
-{relevant_component_definitions}
-"""
+    # Static instructions go first and never vary between calls, so providers with
+    # prompt-prefix caching can reuse the prefill for every file
+    parse_prompt = (
+        _PARSE_PROMPT_STATIC
+        + "### Component Identification Response:\n"
+        + component_identification_response
+        + "\n\n### Component Definitions To Help Resolve Overlaps:\n"
+        + relevant_component_definitions
+        + "\n"
+    )
 
+    # Stream the response and stop reading as soon as the JSON object is closed,
+    # so parsing can start without waiting on any trailing tokens
     llm_client = LLMClient()
-    response: litellm.types.utils.ModelResponse = llm_client.call_llm(
+    chunks = []
+    tracker = JsonObjectTracker()
+    for delta in llm_client.call_llm_stream(
         prompt=parse_prompt,
         max_tokens=2048,
         temperature=0.0,
         repetition_penalty=1.0,
         top_p=0.3,
-    )
-    choices: litellm.types.utils.Choices = response.choices
-    parsed_text = choices[0].message.content or ""
+        use_cache=True,
+    ):
+        chunks.append(delta)
+        if tracker.feed(delta):
+            break
+    parsed_text = "".join(chunks)
 
     with open('rmr_agent/ml_components/component_definitions.json', 'r') as f:
         component_definitions = json.load(f)
-    allowed_components = list(component_definitions.keys())
+    allowed_components = component_definitions.keys()
 
     # Create dictionary with parsed data
     parsed_dict = convert_to_dict(parsed_text)
@@ -139,11 +214,13 @@ def parse_component_identification(component_identification_response, file):
     for component in components_to_delete:
         del parsed_dict[component]
 
+    # Enforce the containment rule from the prompt in case the LLM left nested ranges behind
+    drop_contained_components(parsed_dict)
+
     # Handle single component case
     if len(parsed_dict) == 1:
         # when only one component identified in the file, just take all of the lines in the file for that component. 
-        cleaned_code = preprocess_python_file(file)
-        num_lines = len(cleaned_code.splitlines())
-        metadata['line_range'] = f"1-{num_lines}"
+        (_, metadata), = parsed_dict.items()
+        metadata['line_range'] = f"1-{_file_line_count(file, os.path.getmtime(file))}"
 
     return parsed_text, parsed_dict
\ No newline at end of file
@@ -1,9 +1,14 @@
+import re
+
+# Markdown code fences (```yaml or bare ```) the LLM wraps YAML output in
+_FENCE_RE = re.compile(r"```(?:yaml)?")
+
 
 def generage_dag_yaml(aggregated_nodes: str, edges: str) -> str:
     # Get nodes yaml string
-    nodes_yaml_str = "nodes:\n" + aggregated_nodes.replace("```yaml", "").replace("```", "")
+    nodes_yaml_str = "nodes:\n" + _FENCE_RE.sub("", aggregated_nodes)
     # Get edges yaml string
-    cleaned = edges.replace("```yaml", "").replace("```", "").replace("edges:", "")
+    cleaned = _FENCE_RE.sub("", edges).replace("edges:", "")
     lines = cleaned.strip().split("\n")
     non_empty_lines = [line for line in lines if line.strip()]
 
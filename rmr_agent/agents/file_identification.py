@@ -6,15 +6,15 @@ Optimized version - Faster ML file detection
 import os
 import re
 import json
+import heapq
 from typing import List, Dict, Any, Set
 from pathlib import Path
 import logging
 import concurrent.futures
-import nbformat
 
 # Adjust imports based on your actual project structure
 try:
-    from rmr_agent.llms import LLMClient
+    from rmr_agent.llms import LLMClient, get_llm_client
 except ImportError:
     class LLMClient:
         def call_llm(self, prompt, **kwargs):
@@ -25,8 +25,45 @@ except ImportError:
                 ))
             ])
 
+    def get_llm_client():
+        return LLMClient()
+
 logger = logging.getLogger(__name__)
 
+# Keyword weights
+ML_KEYWORD_WEIGHTS = {
+    # Strong signals in filenames
+    'train': 100,
+    'model': 90,
+    'data': 80,
+    'preprocess': 75,
+    'feature': 70,
+    'eval': 65,
+    'predict': 60,
+    'pipeline': 55,
+    'main': 50,
+    'run': 45,
+}
+
+# Exclusion keywords
+EXCLUDE_KEYWORDS = ('util', 'helper', 'config', 'setting', 'constant', 'init', 'setup', 'install')
+
+# Filenames skipped during the repository scan
+TEST_FILE_PREFIXES = ('test_', 'test.', 'tests.', '__init__')
+TEST_FILE_SUFFIXES = ('_test.py', '_test.ipynb')
+
+# Single-pass scanners over a lowercased name. The keyword pattern is a lookahead so
+# overlapping keywords (e.g. "feature" and "eval" in "featureval") are all reported.
+_ML_KEYWORD_RE = re.compile(r'(?=(' + '|'.join(ML_KEYWORD_WEIGHTS) + r'))')
+_EXCLUDE_RE = re.compile('|'.join(EXCLUDE_KEYWORDS))
+
+# Numbered files (e.g. "01_extract.py") are usually ordered pipeline steps
+_NUMERIC_PREFIX_RE = re.compile(r'^\d+[_\-]')
+_LEADING_NUMBER_RE = re.compile(r'^(\d+)')
+
+# Markdown code fences around the LLM's JSON answer
+_JSON_FENCE_RE = re.compile(r'```[a-z]*\n?')
+
 class LLMFileIdentificationAgent:
     """
     Optimized version: Fast ML file identification
@@ -83,78 +120,97 @@ class LLMFileIdentificationAgent:
             '.ipynb_checkpoints', 'tests', 'test', 'docs', 'doc'
         }
         
-        def scan_directory(path: Path, depth: int = 0) -> List[str]:
-            if depth > 3:  # Limit depth
-                return []
-            
-            files = []
+        max_depth = 3
+        
+        def list_directory(path: str) -> List[os.DirEntry]:
             try:
                 with os.scandir(path) as entries:
-                    for entry in entries:
-                        name_lower = entry.name.lower()
-                        
-                        if entry.is_dir() and entry.name not in skip_dirs:
-                            # Recursively scan subdirectories
-                            if not name_lower.startswith('.'):
-                                files.extend(scan_directory(Path(entry.path), depth + 1))
-                        
-                        elif entry.is_file():
-                            # Quick check of file extensions
-                            if entry.name.endswith(('.py', '.ipynb')):
-                                # Quick filter of obvious non-ML files
-                                if not any(skip in name_lower for skip in ['test', '__pycache__', '.pyc', '__init__']):
-                                    rel_path = Path(entry.path).relative_to(self.repo_path)
-                                    files.append(str(rel_path))
+                    return list(entries)
             except PermissionError:
-                pass
-            
+                return []
+        
+        def is_scannable_dir(entry: os.DirEntry) -> bool:
+            return entry.is_dir() and entry.name not in skip_dirs
+        
+        def is_candidate_file(entry: os.DirEntry) -> bool:
+            # Quick check of file extensions first
+            if not entry.name.endswith(('.py', '.ipynb')) or not entry.is_file():
+                return False
+            # Quick filter of obvious non-ML files (test modules and package inits).
+            # .pyc and __pycache__ never get here: the extension check and skip_dirs cover them.
+            name_lower = entry.name.lower()
+            return not (name_lower.startswith(TEST_FILE_PREFIXES) or name_lower.endswith(TEST_FILE_SUFFIXES))
+        
+        def scan_directory(top: str, top_depth: int) -> List[str]:
+            # Iterative depth-first walk over raw string paths, visiting entries in the same
+            # order a recursive scan would. One iterator per open directory.
+            files = []
+            stack = [iter(list_directory(top))]
+            while stack:
+                entry = next(stack[-1], None)
+                if entry is None:
+                    stack.pop()
+                    continue
+                
+                if is_scannable_dir(entry):
+                    # Descend into subdirectories, limiting depth
+                    if not entry.name.startswith('.') and top_depth + len(stack) <= max_depth:
+                        stack.append(iter(list_directory(entry.path)))
+                elif is_candidate_file(entry):
+                    files.append(entry.path[root_len:])
             return files
         
-        self.all_code_files = scan_directory(self.repo_path)
+        root = os.fspath(self.repo_path)
+        root_len = len(root.rstrip(os.sep)) + 1
+        root_entries = list_directory(root)
+        top_level_dirs = [
+            entry.path for entry in root_entries
+            if is_scannable_dir(entry) and not entry.name.startswith('.')
+        ]
+        
+        # Scan top-level subtrees concurrently; os.scandir releases the GIL, so threads
+        # overlap the syscall latency. Small repos are not worth the thread start-up.
+        if len(top_level_dirs) > 4:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+                subtree_files = dict(zip(top_level_dirs, executor.map(lambda path: scan_directory(path, 1), top_level_dirs)))
+        else:
+            subtree_files = {path: scan_directory(path, 1) for path in top_level_dirs}
+        
+        # Assemble in directory order so the result does not depend on thread timing
+        files = []
+        for entry in root_entries:
+            if entry.path in subtree_files:
+                files.extend(subtree_files[entry.path])
+            elif not is_scannable_dir(entry) and is_candidate_file(entry):
+                files.append(entry.path[root_len:])
+        
+        self.all_code_files = files
         logger.info(f"Fast scan found {len(self.all_code_files)} files")
     
     def _fast_rule_detection(self) -> List[str]:
         """Ultra-fast rule detection - without reading file contents"""
         scores = {}
         
-        # Keyword weights
-        ml_keywords = {
-            # Strong signals in filenames
-            'train': 100,
-            'model': 90,
-            'data': 80,
-            'preprocess': 75,
-            'feature': 70,
-            'eval': 65,
-            'predict': 60,
-            'pipeline': 55,
-            'main': 50,
-            'run': 45,
-        }
-        
-        # Exclusion keywords
-        exclude_keywords = {'util', 'helper', 'config', 'setting', 'constant', 'init', 'setup', 'install'}
-        
         for file_path in self.all_code_files:
             path_lower = file_path.lower()
-            filename_lower = Path(file_path).name.lower()
+            filename = os.path.basename(file_path)
+            filename_lower = filename.lower()
             
             # Quick exclusion
-            if any(exc in filename_lower for exc in exclude_keywords):
+            if _EXCLUDE_RE.search(filename_lower):
                 continue
             
             # Calculate score
             score = 0
             
-            # Check filename
-            for keyword, weight in ml_keywords.items():
-                if keyword in filename_lower:
-                    score += weight
-                elif keyword in path_lower:  # Keywords in path have half the weight
-                    score += weight // 2
+            # Check filename; keywords only in the rest of the path have half the weight
+            filename_keywords = set(_ML_KEYWORD_RE.findall(filename_lower))
+            path_keywords = set(_ML_KEYWORD_RE.findall(path_lower)) - filename_keywords
+            score += sum(ML_KEYWORD_WEIGHTS[keyword] for keyword in filename_keywords)
+            score += sum(ML_KEYWORD_WEIGHTS[keyword] // 2 for keyword in path_keywords)
             
             # Files with numeric prefixes are usually pipeline components
-            if re.match(r'^\d+[_\-]', Path(file_path).name):
+            if _NUMERIC_PREFIX_RE.match(filename):
                 score += 200
             
             # Notebooks are usually main logic
@@ -168,9 +224,9 @@ class LLMFileIdentificationAgent:
             if score > 0:
                 scores[file_path] = score
         
-        # Sort and return
-        sorted_files = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
-        return [f for f, _ in sorted_files[:15]]
+        # Select the top 15 (highest score, then filename) without sorting every candidate
+        top_files = heapq.nsmallest(15, scores.items(), key=lambda x: (-x[1], x[0]))
+        return [f for f, _ in top_files]
     
     def _prepare_minimal_info(self, files: List[str]) -> str:
         """Prepare minimal file information - only look at filenames and paths"""
@@ -179,7 +235,7 @@ class LLMFileIdentificationAgent:
             file_list.append({
                 'path': file_path,
                 'type': 'notebook' if file_path.endswith('.ipynb') else 'script',
-                'name': Path(file_path).name
+                'name': os.path.basename(file_path)
             })
         
         return json.dumps(file_list, indent=2)
@@ -199,7 +255,7 @@ JSON response:
 {{"ml_files": ["file1", "file2"], "confidence": 0.8, "reasoning": "brief"}}"""
 
         try:
-            llm_client = LLMClient()
+            llm_client = get_llm_client()
             response = llm_client.call_llm(
                 prompt=prompt,
                 max_tokens=1024,  # Reduce tokens
@@ -209,7 +265,7 @@ JSON response:
             )
             
             result_text = response.choices[0].message.content or ""
-            result_text = re.sub(r'```[a-z]*\n?', '', result_text.strip())
+            result_text = _JSON_FENCE_RE.sub('', result_text.strip())
             result = json.loads(result_text)
             
             # Verify files
@@ -237,9 +293,9 @@ JSON response:
         
         # Simple sorting rules
         def score_file(file_path: str) -> tuple:
-            name = Path(file_path).name.lower()
+            name = os.path.basename(file_path).lower()
             # Prioritize numeric prefixes
-            num_match = re.match(r'^(\d+)', name)
+            num_match = _LEADING_NUMBER_RE.match(name)
             if num_match:
                 return (0, int(num_match.group(1)), file_path)
             # Keyword priorities
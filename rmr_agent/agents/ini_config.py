@@ -1,16 +1,44 @@
+import io
 import os
 import re
+import json
 import yaml
+import configparser
 import logging
-from datetime import datetime
+import functools
+import itertools
+from datetime import date
 from rmr_agent.llms import LLMClient
-from typing import Dict, Any
+from typing import Dict, Any, Union
+from rmr_agent.utils import dict_to_yaml
+from rmr_agent.utils.response_parsing import SafeLoader
 from rmr_agent.utils.logging_config import setup_logger
 
 # Set up module logger
 logger = setup_logger(__name__)
 
+# Markdown code fence (```ini, ```yaml or plain ```) at the start or end of the response
+_FENCE_RE = re.compile(r"^```(?:ini|yaml)?\s*|^```\s*|\s*```$", re.IGNORECASE)
+# key = value line in environment.ini
+_KV_RE = re.compile(r'(\w+)\s*=\s*(.+)')
+# Key of a "key = value" line: the text before the first "=", without surrounding whitespace
+_ASSIGNMENT_RE = re.compile(r'^[^\S\n]*([^=\n]*?)[^\S\n]*=', re.MULTILINE)
+# refresh_date line in environment.ini
+_REFRESH_DATE_RE = re.compile(r'^[ \t]*refresh_date[ \t]*=.*$', re.MULTILINE)
+
+# Generate both files with one JSON-mode LLM call when the model supports it.
+# Set CONFIG_AGENT_SINGLE_CALL=false to always use the two sequential calls.
+CONFIG_AGENT_SINGLE_CALL = os.getenv("CONFIG_AGENT_SINGLE_CALL", "true").lower() not in ("0", "false", "no")
+
 # ========== **Extract .ini Content from AI Response** ==========
+def _strip_code_fence(text):
+    """Strips whitespace and Markdown-style code block formatting, including ```ini, ```yaml, or plain ```."""
+    text = text.strip()
+    # Most responses come without a fence; a substring check is cheaper than the regex pass
+    if "```" not in text:
+        return text
+    return _FENCE_RE.sub("", text)
+
 def extract_ini_content(response):
     """Extracts and cleans `[general]` section content from LLM response. Ensures .ini format and removes markdown."""
     if response is None:
@@ -23,65 +51,66 @@ def extract_ini_content(response):
     if not response_text:
         raise ValueError("AI returned an empty `.ini` content.")
 
-    # Remove Markdown-style code block formatting, including ```ini, ```yaml, or plain ```
-    response_text = re.sub(r"^```(?:ini|yaml)?\s*|^```\s*|\s*```$", "", response_text.strip(), flags=re.IGNORECASE)
-
-    return response_text
+    return _strip_code_fence(response_text)
 
 # ========== **Filter duplicate lines** ==========
 def filter_duplicate_value_lines(ini_str, verified_dag):
 
-    controlled_params = set()
+    # Attribute names carried by DAG edges are set by the upstream component; keep only their first assignment
+    controlled_params = set(itertools.chain.from_iterable(
+        edge.get("attributes") or {} for edge in verified_dag.get("edges") or []
+    ))
     seen_controlled_params = set()
-
-    for edge in verified_dag.get("edges", []):
-        attributes = edge.get("attributes", {})
-        for param_name in attributes.keys():
-            controlled_params.add(param_name)
-
-    filtered_lines = []
-    current_section = None
-
-    for line in ini_str.splitlines():
-        stripped = line.strip()
-
-        if stripped.startswith("[") and stripped.endswith("]"):
-            current_section = stripped.strip("[]").lower()
-            filtered_lines.append(line)
+    if not controlled_params:
+        return ini_str
+
+    # Only "key = value" lines can be dropped: walk those and copy the text between
+    # repeated ones, instead of splitting and re-joining every line of the file
+    filtered = io.StringIO()
+    kept_from = 0
+    for match in _ASSIGNMENT_RE.finditer(ini_str):
+        key = match.group(1)
+        if key not in controlled_params:
             continue
-
-        if stripped == "":
-            filtered_lines.append(line)
+        if key not in seen_controlled_params:
+            seen_controlled_params.add(key)
             continue
-
-        if "=" in line:
-            key, value = line.split("=", 1)
-            key = key.strip()
-            value = value.strip()
-
-            if key in controlled_params:
-                if key not in seen_controlled_params:
-                    filtered_lines.append(line)
-                    seen_controlled_params.add(key)
-                else:
-                    continue
-            else:
-                filtered_lines.append(line)
-        else:
-            filtered_lines.append(line)
-
-    return "\n".join(filtered_lines)
+        filtered.write(ini_str[kept_from:match.start()])
+        line_end = ini_str.find("\n", match.end())
+        kept_from = len(ini_str) if line_end == -1 else line_end + 1
+
+    if not kept_from:
+        return ini_str
+    filtered.write(ini_str[kept_from:])
+    filtered_str = filtered.getvalue()
+    # A dropped last line leaves the line break before it dangling
+    if kept_from == len(ini_str) and not ini_str.endswith("\n"):
+        filtered_str = filtered_str.removesuffix("\n")
+    return filtered_str
 
 # ========== **Replace hard-coded params with general configurable params in env.ini** ==========
 def parse_env_ini(env_ini):
     """
     Parse environment_ini_str into a dictionary of key-value pairs.
+    Reads the [general] section with configparser; falls back to a line scan when the
+    LLM output is not a well-formed ini file (e.g. no section header).
     :param env_ini_str: The environment ini content as a string.
     :return: A dictionary of parameters.
     """
+    parser = configparser.ConfigParser(interpolation=None, strict=False, delimiters=("=",))
+    parser.optionxform = str  # keep parameter names case-sensitive
+    try:
+        # Indented lines would otherwise be read as continuations of the previous value
+        parser.read_string("\n".join(line.lstrip() for line in env_ini.splitlines()))
+    except configparser.Error as e:
+        logger.debug("environment.ini is not well-formed (%s), falling back to line scan", e)
+    else:
+        if parser.has_section("general"):
+            return {key: value.strip() for key, value in parser.items("general") if value.strip()}
+
     env_vars = {}
     for line in env_ini.splitlines():
-        match = re.match(r'(\w+)\s*=\s*(.+)', line)  # Match key=value pairs
+        match = _KV_RE.match(line.lstrip())  # Match key=value pairs
         if match:
             key, value = match.groups()
             env_vars[key] = value.strip()
@@ -94,53 +123,42 @@ def replace_with_env_vars(generated_file, env_vars):
     :param env_vars: Dictionary of environment variables.
     :return: The modified file content.
     """
-    for param_name, param_value in sorted(env_vars.items(), key=lambda x: -len(x[1])):  # Sort by length (longest first)
-        if param_value and param_value in generated_file:
-            generated_file = generated_file.replace(param_value, f"${{general:{param_name}}}")
-
-    return generated_file
+    # Values that do not occur in the file are dropped by a plain substring check before sorting
+    present_vars = [
+        (param_name, param_value) for param_name, param_value in env_vars.items()
+        if param_value and param_value in generated_file
+    ]
+    # Map each value to its placeholder; for duplicate values the first name (longest-first order) wins
+    placeholders = {}
+    for param_name, param_value in sorted(present_vars, key=lambda x: -len(x[1])):  # Sort by length (longest first)
+        if param_value not in placeholders:
+            placeholders[param_value] = f"${{general:{param_name}}}"
+    if not placeholders:
+        return generated_file
+
+    # One scan over the file: the alternation is ordered longest first, so at each position the
+    # longest matching value wins, and inserted placeholders are never rescanned
+    values_pattern = re.compile("|".join(re.escape(value) for value in placeholders))
+    return values_pattern.sub(lambda match: placeholders[match.group(0)], generated_file)
 
 # ========== **fill in today's date** ==========
+@functools.lru_cache(maxsize=4)
+def _date_str(day_ordinal: int) -> str:
+    """YYYY-MM-DD string for a date ordinal, formatted once per day."""
+    return date.fromordinal(day_ordinal).strftime('%Y-%m-%d')
+
 def fill_in_today_date(ini_content: str) -> str:
     """
     Replaces the line starting with 'refresh_date =' with today's date in the given .ini content.
     """
-    today_str = datetime.today().strftime('%Y-%m-%d')
-    lines = ini_content.splitlines()
-
-    for i, line in enumerate(lines):
-        if line.strip().startswith("refresh_date"):
-            lines[i] = f"refresh_date = {today_str}"
-            break
-
-    return "\n".join(lines)
-
-
-# ========== **Config Agent Part** ==========
-def config_agent(verified_dag: Dict[str, Any], llm_model: str = "gpt-4o") -> Dict[str, Dict[str, Dict[str, str]]]:
-    """
-    Parses the verified DAG (YAML structure) and generates solution.ini and environment.ini content using an AI agent.
+    today_str = _date_str(date.today().toordinal())
+    return _REFRESH_DATE_RE.sub(f"refresh_date = {today_str}", ini_content, count=1)
 
-    Parameters:
-    - verified_dag: Dict[str, Any] -> The validated DAG structure (parsed YAML)
-    - llm_model: str -> Name of the LLM model to use (default: "gpt-4o")
-
-    Returns:
-    - Dict[str, Dict[str, Dict[str, str]]]: 
-      - "solution_ini": Parsed solution.ini content
-      - "environment_ini": Parsed environment.ini content
-    """
-
-    # Load YAML structure directly from verified_dag
-
-    llm_client = LLMClient(model_name=llm_model)
-
-    # ========== **Step 1: AI agent generates environment.ini content** ==========
-    prompt_environment = f"""
-    You are an AI agent that processes machine learning pipeline configurations in YAML format. 
-    Your task is to analyze the provided YAML structure and generate a corresponding environment.ini content.
 
-    ### Task Overview:
+# ========== **Prompt Templates** ==========
+# Built once at import and filled in with str.format, so literal braces are doubled.
+# The guidelines are shared by the per-file prompts and the combined JSON-mode prompt.
+_ENVIRONMENT_INI_GUIDELINES = """    ### Task Overview:
     - The structure of `environment.ini` is **fixed and must not be changed**.
     - Your goal is to **fill in the missing values based on the given YAML data**.
     - If a value **exists in the YAML**, insert it into the corresponding field.
@@ -201,38 +219,9 @@ def config_agent(verified_dag: Dict[str, Any], llm_model: str = "gpt-4o") -> Dic
     6. **Validation**
     - Verify that each hardcoded directory level in both `local_output_base_path` and `gcs_base_path` is either:
         - Correctly replaced by a configurable parameter, or
-        - Left unchanged if it does not correspond to a dynamic parameter.
-
-
-    ### YAML Content
-    The YAML content is provided below:
-    ```yaml
-    {yaml.dump(verified_dag, default_flow_style=False)}
-    ```
-
-    Now, generate a properly formatted `environment.ini` configuration file as a string.
-    The format should follow standard `.ini` conventions, with sections enclosed in square brackets (`[section]`),
-    and key-value pairs using the `key = value` syntax. Avoid using JSON format.
-    """
-
-    response_environment = llm_client.call_llm(
-        prompt=prompt_environment,
-        max_tokens=500,
-        temperature=0,
-        repetition_penalty=1.0,
-        top_p=0.1
-    )
-
-    environment_ini_str = fill_in_today_date(extract_ini_content(response_environment))
-
-    # ========== **Step 2: AI agent generates solution.ini content** ==========
-    llm_client = LLMClient(model_name=llm_model)
+        - Left unchanged if it does not correspond to a dynamic parameter."""
 
-    prompt_solution = f"""
-    You are an AI agent that processes machine learning pipeline configurations in YAML format. 
-    Your task is to analyze the provided YAML structure and the environment.ini, and generate a corresponding solution.ini content.
-
-    <Task Overview>
+_SOLUTION_INI_GUIDELINES = """    <Task Overview>
     This task involves converting a YAML file into an INI format while maintaining structural integrity and ensuring configurability. 
 
     <Steps to Follow>
@@ -298,12 +287,77 @@ def config_agent(verified_dag: Dict[str, Any], llm_model: str = "gpt-4o") -> Dic
         driver_dev_table_list = driver_${{general:environment}}_features
         model_version_path = ../_current_model_version
         exported_eval_readout_base = ../artifacts/18/exported_eval_readouts
-    ###
+    ###"""
+
+
+_COMBINED_PROMPT_TEMPLATE = (
+    """
+    You are an AI agent that processes machine learning pipeline configurations in YAML format. 
+    Your task is to analyze the provided YAML structure and generate two configuration files:
+    first environment.ini, then solution.ini, which uses the environment.ini you generated.
+
+    ## Part 1: environment.ini
+
+"""
+    + _ENVIRONMENT_INI_GUIDELINES
+    + """
+
+    ## Part 2: solution.ini
+
+"""
+    + _SOLUTION_INI_GUIDELINES
+    + """
+
+
+    ### YAML Content
+    The YAML content is provided below:
+    ```yaml
+    {dag_yaml_text}
+    ```
+
+    ### Response Format
+    Respond with a JSON object with exactly two string fields, `environment_ini` and `solution_ini`,
+    each holding the full content of that file in standard `.ini` format (sections enclosed in square
+    brackets (`[section]`) and key-value pairs using the `key = value` syntax):
+    {{"environment_ini": "<environment.ini content>", "solution_ini": "<solution.ini content>"}}
+    """
+)
+
+_ENVIRONMENT_PROMPT_TEMPLATE = (
+    """
+    You are an AI agent that processes machine learning pipeline configurations in YAML format. 
+    Your task is to analyze the provided YAML structure and generate a corresponding environment.ini content.
+
+"""
+    + _ENVIRONMENT_INI_GUIDELINES
+    + """
+
+
+    ### YAML Content
+    The YAML content is provided below:
+    ```yaml
+    {dag_yaml_text}
+    ```
+
+    Now, generate a properly formatted `environment.ini` configuration file as a string.
+    The format should follow standard `.ini` conventions, with sections enclosed in square brackets (`[section]`),
+    and key-value pairs using the `key = value` syntax. Avoid using JSON format.
+    """
+)
+
+_SOLUTION_PROMPT_TEMPLATE = (
+    """
+    You are an AI agent that processes machine learning pipeline configurations in YAML format. 
+    Your task is to analyze the provided YAML structure and the environment.ini, and generate a corresponding solution.ini content.
+
+"""
+    + _SOLUTION_INI_GUIDELINES
+    + """
         
 
     ### Below is the YAML content and the environment.ini content:
     ```yaml
-    {yaml.dump(verified_dag, default_flow_style=False)}
+    {dag_yaml_text}
     ```environment.ini
     {environment_ini_str}
 
@@ -311,8 +365,66 @@ def config_agent(verified_dag: Dict[str, Any], llm_model: str = "gpt-4o") -> Dic
     The format should follow standard `.ini` conventions, with sections enclosed in square brackets (`[section]`),
     and key-value pairs using the `key = value` syntax. Avoid using JSON format.
     """
+)
 
-    logger.debug("Prompt used in the solution.ini generation: %s", prompt_solution)
+# ========== **Generate both .ini files in one call** ==========
+def _generate_configs_single_call(llm_client, dag_yaml_text):
+    """
+    Generates environment.ini and solution.ini with a single JSON-mode LLM call.
+    Returns (environment_ini_str, solution_ini_str), or None when the response is not the expected JSON object.
+    """
+    prompt_combined = _COMBINED_PROMPT_TEMPLATE.format(dag_yaml_text=dag_yaml_text)
+
+    response = llm_client.call_llm(
+        prompt=prompt_combined,
+        max_tokens=4596,  # budget of both separate calls (500 + 4096)
+        temperature=0,
+        repetition_penalty=1.0,
+        top_p=0.1,
+        response_format={"type": "json_object"}
+    )
+
+    try:
+        configs = json.loads(response.choices[0].message.content)
+        environment_ini_text = configs["environment_ini"]
+        solution_ini_text = configs["solution_ini"]
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+        logger.warning("Unusable combined .ini response (%s), falling back to separate calls", e)
+        return None
+    if not (isinstance(environment_ini_text, str) and environment_ini_text.strip()
+            and isinstance(solution_ini_text, str) and solution_ini_text.strip()):
+        logger.warning("Combined .ini response is missing a file, falling back to separate calls")
+        return None
+
+    environment_ini_str = fill_in_today_date(_strip_code_fence(environment_ini_text))
+    return environment_ini_str, _strip_code_fence(solution_ini_text)
+
+# ========== **Generate the .ini files in two calls** ==========
+def _generate_configs_sequential(llm_client, dag_yaml_text):
+    """
+    Generates environment.ini, then solution.ini from it, with two LLM calls.
+    Returns (environment_ini_str, solution_ini_str).
+    """
+    # ========== **Step 1: AI agent generates environment.ini content** ==========
+    prompt_environment = _ENVIRONMENT_PROMPT_TEMPLATE.format(dag_yaml_text=dag_yaml_text)
+
+    response_environment = llm_client.call_llm(
+        prompt=prompt_environment,
+        max_tokens=500,
+        temperature=0,
+        repetition_penalty=1.0,
+        top_p=0.1
+    )
+
+    environment_ini_str = fill_in_today_date(extract_ini_content(response_environment))
+
+    # ========== **Step 2: AI agent generates solution.ini content** ==========
+    prompt_solution = _SOLUTION_PROMPT_TEMPLATE.format(
+        dag_yaml_text=dag_yaml_text, environment_ini_str=environment_ini_str
+    )
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Prompt used in the solution.ini generation: %s", prompt_solution)
 
     response_solution = llm_client.call_llm(
         prompt=prompt_solution,
@@ -322,11 +434,53 @@ def config_agent(verified_dag: Dict[str, Any], llm_model: str = "gpt-4o") -> Dic
         top_p=0.1
     )
 
+    return environment_ini_str, extract_ini_content(response_solution)
+
+
+# ========== **Config Agent Part** ==========
+def config_agent(verified_dag: Union[str, Dict[str, Any]], llm_model: str = "gpt-4o") -> Dict[str, Dict[str, Dict[str, str]]]:
+    """
+    Parses the verified DAG (YAML structure) and generates solution.ini and environment.ini content using an AI agent.
+
+    Parameters:
+    - verified_dag: str or Dict[str, Any] -> The validated DAG, as YAML text (what the workflow passes) or parsed
+    - llm_model: str -> Name of the LLM model to use (default: "gpt-4o")
+
+    Returns:
+    - Dict[str, Dict[str, Dict[str, str]]]: 
+      - "solution_ini": Parsed solution.ini content
+      - "environment_ini": Parsed environment.ini content
+    """
+
+    # Serialize the DAG once for both prompts. The workflow already hands over YAML text,
+    # which is used as-is instead of being dumped again as a quoted YAML string.
+    if isinstance(verified_dag, str):
+        dag_yaml_text = verified_dag
+    else:
+        dag_yaml_text = dict_to_yaml(verified_dag)
+
+    llm_client = LLMClient(model_name=llm_model)
+
     try:
+        # One JSON-mode call returns both files; models without JSON mode, or a combined
+        # response that does not parse, go through the two sequential calls instead
+        configs = None
+        if CONFIG_AGENT_SINGLE_CALL and llm_client.handler.supports_json_mode:
+            configs = _generate_configs_single_call(llm_client, dag_yaml_text)
+        if configs is None:
+            configs = _generate_configs_sequential(llm_client, dag_yaml_text)
+        environment_ini_str, solution_ini_text = configs
+
         env_vars = parse_env_ini(environment_ini_str)
-        logger.debug("verified_dag = %s", repr(verified_dag))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("verified_dag = %r", verified_dag)
 
-        solution_ini_str = replace_with_env_vars(filter_duplicate_value_lines(extract_ini_content(response_solution),yaml.safe_load(verified_dag)),env_vars)
+        # The duplicate-line filter needs the DAG as a dict
+        if isinstance(verified_dag, str):
+            dag_dict = yaml.load(verified_dag, Loader=SafeLoader) or {}
+        else:
+            dag_dict = verified_dag
+        solution_ini_str = replace_with_env_vars(filter_duplicate_value_lines(solution_ini_text, dag_dict), env_vars)
 
         result = {
             "environment_ini": environment_ini_str,
@@ -337,27 +491,3 @@ def config_agent(verified_dag: Dict[str, Any], llm_model: str = "gpt-4o") -> Dic
     except ValueError as e:
         logger.error("Error extracting .ini content: %s", e)
         raise  
-    
- # ========== **Step 3: Simple Unit Test Code** ==========
-# if __name__ == "__main__":
-#     # Base paths
-#     BASE_DIR = "/Users/yanfdai/Desktop/codespace/DAG_FULLSTACK/rmr_agent/rmr_agent"
-#     CHECKPOINT_DIR = os.path.join(BASE_DIR, "checkpoints", "ql-store-recommendation-prod", "1")
-#     CONFIG_DIR = os.path.join(BASE_DIR, "config")
-
-#     # Load DAG config
-#     dag_path = os.path.join(CHECKPOINT_DIR, "dag_copy.yaml")
-#     with open(dag_path, "r") as f:
-#         verified_dag = yaml.safe_load(f)
-
-#     # Generate config
-#     config = config_agent(verified_dag)
-
-#     # Save configs
-#     os.makedirs(CONFIG_DIR, exist_ok=True)
-#     save_ini_file("environment.ini", config["environment_ini"], CONFIG_DIR)
-#     save_ini_file("solution.ini", config["solution_ini"], CONFIG_DIR)
-
-#     print(f"[✓] INI files saved to: {CONFIG_DIR}")
-#     print(f"[✓] Checkpoint directory used: {CHECKPOINT_DIR}")
-
@@ -5,6 +5,22 @@ import re
 from typing import List, Dict
 import litellm
 from rmr_agent.llms import LLMClient
+from rmr_agent.utils.response_parsing import SafeDumper
+
+
+# Custom YAML string representer for cleaner output
+def _represent_str(dumper, data):
+    if '\n' in data:
+        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
+    return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='')
+
+
+class _NodeYamlDumper(SafeDumper):
+    """Safe dumper (libyaml-backed when available) carrying the node string representer."""
+
+
+# Registered on the dedicated dumper once, instead of on the global yaml.Dumper at every call
+_NodeYamlDumper.add_representer(str, _represent_str)
 
 
 def clean_string_value(value):
@@ -13,8 +29,11 @@ def clean_string_value(value):
         return "undefined"
     if not isinstance(value, str):
         return str(value)
-    if (value.startswith('"') and value.endswith('"')) or (value.startswith("'") and value.endswith("'")):
+    if value and value[0] in "\"'" and value[-1] == value[0]:
         value = value[1:-1]
+    # Most values carry no escapes; skip both replace passes for them
+    if "\\" not in value:
+        return value
     return value.replace('\\"', '"').replace("\\'", "'")
 
 def dict_list_to_yaml(components_list):
@@ -41,41 +60,30 @@ def dict_list_to_yaml(components_list):
             count = component_counts[component_name]
             final_name = f"{component_name} {count}" if count > 1 else component_name
 
-            # Initialize component structure
+            # Component structure, with inputs and outputs as name -> cleaned value
             component_entry = {
                 final_name: {
                     'file_name': component_data.get('file_name', 'unknown_file'),
                     'line_range': component_data.get('line_range', ''),
-                    'inputs': {},
-                    'outputs': {}
+                    'inputs': {
+                        input_item.get("name", "unnamed_variable"): clean_string_value(input_item.get("value", "undefined"))
+                        for input_item in component_data.get('inputs', [])
+                    },
+                    'outputs': {
+                        output_item.get("name", "unnamed_variable"): clean_string_value(output_item.get("value", "undefined"))
+                        for output_item in component_data.get('outputs', [])
+                    }
                 }
             }
 
-            # Process inputs
-            for input_item in component_data.get('inputs', []):
-                key = input_item.get("name", "unnamed_variable")
-                val = clean_string_value(input_item.get("value", "undefined"))
-                component_entry[final_name]['inputs'][key] = val
-
-            # Process outputs
-            for output_item in component_data.get('outputs', []):
-                key = output_item.get("name", "unnamed_variable")
-                val = clean_string_value(output_item.get("value", "undefined"))
-                component_entry[final_name]['outputs'][key] = val
-
             # Add to the list
             yaml_data.append(component_entry)
 
-    # Custom YAML string representer for cleaner output
-    def represent_str(dumper, data):
-        if '\n' in data:
-            return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='|')
-        return dumper.represent_scalar('tag:yaml.org,2002:str', data, style='')
-
-    yaml.add_representer(str, represent_str)
-
     # Convert to YAML and return
-    return yaml.dump(yaml_data, default_flow_style=False, sort_keys=False)
+    yaml_string = yaml.dump(yaml_data, Dumper=_NodeYamlDumper, default_flow_style=False, sort_keys=False)
+    # Emitters may close the document with "..." after a keep-chomped ("|+") block scalar. generage_dag_yaml
+    # appends the edges to this text, which would then start a second document, so leave the document open
+    return yaml_string.removesuffix("...\n")
 
 
 def node_aggregator_agent(all_final_components: List[Dict]):
@@ -1,20 +1,23 @@
+import io
 import os
 import re
 import configparser
 from typing import Dict, Any
-import yaml
-import json
 import logging
 from rmr_agent.utils.logging_config import setup_logger
 
 # Set up module logger
 logger = setup_logger(__name__)
 
+# "start-end" pair in a node's line_range, e.g. "Lines 25-94"
+_LINE_RANGE_RE = re.compile(r"(\d+)-(\d+)")
+
 def clean_prefix(path: str) -> str:
     return os.path.splitext(os.path.basename(path))[0].strip().lower()
 
 def normalize_node_name(name):
-    return re.sub(r'\s+', '_', name.strip().lower())
+    # split() breaks on the same whitespace runs as r'\s+', and the stripped name has none at the ends
+    return "_".join(name.strip().lower().split())
 
  # === EXTRACT CODE FROM CLEAN_CODE ===
 def extract_code_from_json(cleaned_code, verified_dag):
@@ -31,15 +34,23 @@ def extract_code_from_json(cleaned_code, verified_dag):
     # cleaned_code = json_file.get("cleaned_code", {})
     extracted_code = {}
 
+    # Cleaned prefix -> file path, so each node is matched with one lookup; the first file wins, as in a scan
+    path_by_prefix = {}
+    for json_file_path in cleaned_code:
+        path_by_prefix.setdefault(clean_prefix(json_file_path), json_file_path)
+    # Source lines per matched file, split on first use; nodes usually share a few files
+    lines_by_file = {}
+    # DAG file_name -> cleaned prefix, for the same reason
+    dag_prefix_by_file = {}
+
     for node in verified_dag["nodes"]:
         # Get node's name（
-        node_name, node_info = list(node.items())[0]
+        node_name, node_info = next(iter(node.items()))
       
         full_file_path = node_info["file_name"]  # full path
-        file_prefix = os.path.splitext(os.path.basename(full_file_path))[0]  # extract the path without Filename Extension
         line_range_str = node_info["line_range"]
 
-        match = re.search(r"(\d+)-(\d+)", line_range_str)
+        match = _LINE_RANGE_RE.search(line_range_str)
 
         if not match:
             logger.warning(f"Invalid line range format for {node_name}: {line_range_str}")
@@ -47,24 +58,17 @@ def extract_code_from_json(cleaned_code, verified_dag):
         start_line, end_line = int(match.group(1)), int(match.group(2))
 
         # search for the matching files in JSON
-        matched_file = None
-        dag_prefix = clean_prefix(file_prefix)
-
-        # print(f"\n🔍 Searching match for DAG prefix: '{dag_prefix}'")
-        # print("📂 Available cleaned_code prefixes:")
-
-        for json_file_path in cleaned_code.keys():
-            json_file_prefix = clean_prefix(json_file_path)
-            # print(f"  - {json_file_prefix}")
-            
-            if json_file_prefix == dag_prefix:
-                matched_file = json_file_path
-                logger.debug(f"✅ Match found: {json_file_path}")
-                break
+        dag_prefix = dag_prefix_by_file.get(full_file_path)
+        if dag_prefix is None:
+            file_prefix = os.path.splitext(os.path.basename(full_file_path))[0]  # extract the path without Filename Extension
+            dag_prefix = dag_prefix_by_file[full_file_path] = clean_prefix(file_prefix)
+        matched_file = path_by_prefix.get(dag_prefix)
 
         if matched_file:
-            code_content = cleaned_code[matched_file]
-            lines = code_content.split("\n")
+            logger.debug("✅ Match found: %s", matched_file)
+            lines = lines_by_file.get(matched_file)
+            if lines is None:
+                lines = lines_by_file[matched_file] = cleaned_code[matched_file].split("\n")
             selected_lines = lines[start_line-1:end_line]
 
             extracted_code[node_name] = {
@@ -75,15 +79,6 @@ def extract_code_from_json(cleaned_code, verified_dag):
 
     return extracted_code
 
-# BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))  # rmr_agent directory
-# CHECKPOINTS_DIR = os.path.join(BASE_DIR, "checkpoints", "ql-store-recommendation-prod","1")
-# dag_yaml = os.path.join(CHECKPOINTS_DIR, "dag_copy.yaml")
-# JSON_FILE = os.path.join(CHECKPOINTS_DIR, "summarize.json")
-# extracted_code = extract_code_from_json(JSON_FILE, dag_yaml)
-
-# for node, data in extracted_code.items():
-#     print(f"\n# Extracted code for {node}:\n{data['code']}")
-
  # === NOTEBOOK AGENT CODE ===
 def notebook_agent(verified_dag, cleaned_code, local_repo_path):
     """
@@ -101,6 +96,8 @@ def notebook_agent(verified_dag, cleaned_code, local_repo_path):
     SOL_FILE = os.path.join(CONFIG_DIR, "solution.ini")
 
     os.makedirs(NOTEBOOKS_DIR, exist_ok=True)
+    # NOTEBOOKS_DIR with a trailing separator; generated file names are relative, so joining is a concatenation
+    notebooks_dir_prefix = os.path.join(NOTEBOOKS_DIR, "")
     logger.info(f"Created notebooks directory: {NOTEBOOKS_DIR}")
 
     # === Step 2: read environment.ini and solution.ini ===
@@ -130,24 +127,52 @@ def notebook_agent(verified_dag, cleaned_code, local_repo_path):
             if "attributes" in edge:
                 edge_attributes.setdefault(to_section, {}).setdefault(from_section, {}).update(edge["attributes"])
 
-    logger.debug(f"Final dependencies mapping: {dependencies}")
-    logger.debug(f"Final edge attributes mapping: {edge_attributes}")
+    logger.debug("Final dependencies mapping: %s", dependencies)
+    logger.debug("Final edge attributes mapping: %s", edge_attributes)
 
     # === Step 4: generate Python file（based on solution.ini）===
     generated_files = {}
+
+    # General parameter lines are the same in every generated file, so build them once
+    required_keys = [
+        "mo_name",
+        "driver_dataset",
+        "dataproc_project_name",
+        "dataproc_storage_bucket",
+        "gcs_base_path",
+        "queue_name",
+        "check_point",
+        "state_file"
+    ]
+    general_params_code = ""
+    if "general" in config:
+        general_params_code = "".join(f"{key} = config.get('general', '{key}')\n" for key in required_keys)
+
+    # Normalized node name -> node data, shared by all sections
+    node_dict = {}
+    for item in verified_dag.get("nodes", []):
+        if isinstance(item, dict):
+            for raw_name, data in item.items():
+                norm_name = normalize_node_name(raw_name)
+                node_dict[norm_name] = data
+
+    # Extract each node's research code once for all sections
+    extracted_code = extract_code_from_json(cleaned_code, verified_dag)
     sections = [s for s in config.sections() if s.lower() != "general"]
+    sections_with_code = 0
 
     for index, section_name in enumerate(sections):
         node_name = section_name.strip().lower().replace(" ", "_")  # standardized file name
         filename = f"{index}_{node_name}.py" 
-        file_path = os.path.join(NOTEBOOKS_DIR, filename)
+        file_path = notebooks_dir_prefix + filename
         generated_files[section_name] = file_path  # record file's path
-        logger.info(f"Generating file for: {section_name} (node_name: {node_name})")
-        logger.debug(f"Checking dependencies for {node_name}: {dependencies.get(node_name, 'None')}")
-        logger.debug(f"Checking edge attributes for {node_name}: {edge_attributes.get(node_name, 'None')}")
+        logger.debug("Generating file for: %s (node_name: %s)", section_name, node_name)
+        logger.debug("Checking dependencies for %s: %s", node_name, dependencies.get(node_name, 'None'))
+        logger.debug("Checking edge attributes for %s: %s", node_name, edge_attributes.get(node_name, 'None'))
 
          # === Standard Code for RMR ===       
-        with open(file_path, "w", encoding="utf-8") as f:
+        # Assembled in memory and written to disk with a single write per notebook
+        with io.StringIO() as f:
             f.write("""# %%
 ## gsutil authentication
 %ppauth
@@ -190,21 +215,7 @@ print(f'username={username}, working_path={working_path}')
             f.write(f"# %%\n")
             f.write("# General Parameters \n")
 
-            required_keys = [
-                "mo_name",
-                "driver_dataset",
-                "dataproc_project_name",
-                "dataproc_storage_bucket",
-                "gcs_base_path",
-                "queue_name",
-                "check_point",
-                "state_file"
-            ]
-
-            if "general" in config:
-                for key in required_keys:
-                    f.write(f"{key} = config.get('general', '{key}')\n")
-
+            f.write(general_params_code)
             f.write("\n")
 
 
@@ -216,15 +227,15 @@ print(f'username={username}, working_path={working_path}')
             f.write("\n")
 
             # === Dependencies from DAG ===
-            node_dict = {}
-            for item in verified_dag.get("nodes", []):
-                if isinstance(item, dict):
-                    for raw_name, data in item.items():
-                        norm_name = normalize_node_name(raw_name)
-                        node_dict[norm_name] = data
-            
             norm_node_name = normalize_node_name(node_name)
             current_node_params = node_dict.get(norm_node_name, {}).get("inputs", {})
+            # Input value -> first input name carrying it, for matching edge attributes by value
+            param_by_value = {}
+            for curr_key, curr_val in current_node_params.items():
+                try:
+                    param_by_value.setdefault(curr_val, curr_key)
+                except TypeError:
+                    pass  # unhashable (list/dict) values are matched by the scan below
             # print("🎯 Current normalized node:", norm_node_name)
             # print("🧩 Current params:", current_node_params)
 
@@ -236,31 +247,27 @@ print(f'username={username}, working_path={working_path}')
                 if dep_attributes:
                     f.write("# Edge Attributes from DAG\n")
                     for dep_key, dep_val in dep_attributes.items():
-                        matched_key = None
-                        for curr_key, curr_val in current_node_params.items():
-                            if curr_val == dep_val:
-                                matched_key = curr_key
-                                break
+                        try:
+                            matched_key = param_by_value.get(dep_val)
+                        except TypeError:
+                            matched_key = next(
+                                (curr_key for curr_key, curr_val in current_node_params.items() if curr_val == dep_val),
+                                None
+                            )
 
                         final_key = matched_key if matched_key else dep_key
                         f.write(f"{final_key} = config.get('{from_node}', '{dep_key}')\n")
-                        logger.debug(f"Writing edge attribute: {final_key} = config.get('{from_node}', '{dep_key}')")
+                        logger.debug("Writing edge attribute: %s = config.get('%s', '%s')", final_key, from_node, dep_key)
 
             f.write("\n")
 
             # === Research Code === 
-            extracted_code = extract_code_from_json(cleaned_code,verified_dag)
-    
-            if section_name.lower() == "general": 
-                logger.info(f"Skipping general section: {section_name}")
-                continue
-
             match_key = next(
                 (k for k in extracted_code if k.lower().replace(" ", "_") == section_name),
                 None
             )
             if match_key:
-                logger.debug(f"MATCH FOUND: {match_key}")
+                logger.debug("MATCH FOUND: %s", match_key)
 
                 research_code_lines = extracted_code[match_key]["code"].split("\n")  
                 cleaned_code_list = []
@@ -275,53 +282,21 @@ print(f'username={username}, working_path={working_path}')
                 # f.write("\n" + "# === Research Code ===\n")
                 f.write(research_code + "\n")
                 # f.write("\nprint('Script initialized')\n")
-                logger.info(f"Research code inserted into {file_path}")
+                sections_with_code += 1
+                logger.debug("Research code inserted into %s", file_path)
             else:
                 logger.warning(f"No research code found for {section_name}")
 
-        logger.debug(f"Created: {file_path}")
+            notebook_text = f.getvalue()
+
+        with open(file_path, "w", encoding="utf-8") as notebook_file:
+            notebook_file.write(notebook_text)
+        logger.debug("Created: %s", file_path)
 
-    logger.info("All sections processed. Python files are ready in notebooks/")
+    logger.info(
+        "All sections processed. %d Python files (%d with research code) are ready in %s",
+        len(generated_files), sections_with_code, NOTEBOOKS_DIR
+    )
     
     return  generated_files
   # might return a dict
-
-# #==========================simple test====================================
-# if __name__ == "__main__":
-#     # set up path
-#     BASE_DIR = "/Users/yanfdai/Desktop/codespace/DAG_FULLSTACK/rmr_agent/rmr_agent"
-#     NOTEBOOKS_DIR = os.path.join(BASE_DIR, "notebooks_test")
-
-#     local_repo_path = "/Users/yanfdai/Desktop/codespace/DAG_FULLSTACK/rmr_agent/rmr_agent/repos/bt-retry-v2"
-
-#     CHECKPOINTS_DIR = os.path.join(BASE_DIR, "checkpoints", "bt-retry-v2","3")
-#     dag_yaml = os.path.join(CHECKPOINTS_DIR, "dag.yaml")
-#     json_path= os.path.join(CHECKPOINTS_DIR,"summarize.json" )
-    
-#     with open(json_path, "r", encoding="utf-8") as f:
-#         json_file = json.load(f)
-
-#     json = json_file.get('cleaned_code')
-    
-#     with open(dag_yaml, "r", encoding="utf-8") as f:
-#         verified_dag = yaml.safe_load(f)
-
-#     # with open(dag_state, "r", encoding="utf-8") as f:
-#     #     dag_file = json.load(f)
-
-#     generated_files = notebook_agent(verified_dag, json, local_repo_path)
-
-#     # check notebooks
-#     if os.path.exists(NOTEBOOKS_DIR):
-#         print(f" Notebooks directory exists: {NOTEBOOKS_DIR}")
-#     else:
-#         print(f" Notebooks directory missing: {NOTEBOOKS_DIR}")
-
-#     # check py file
-#     for section, file_path in generated_files.items():
-#         if os.path.exists(file_path):
-#             print(f" File exists: {file_path}")
-#         else:
-#             print(f" File missing: {file_path}")
-
-#     print(" Notebook generation test completed!")
\ No newline at end of file
@@ -1,48 +1,161 @@
 import os
+import re
+import functools
 import litellm
 import logging
-from rmr_agent.llms import LLMClient
+from concurrent.futures import ThreadPoolExecutor
+from rmr_agent.llms import get_llm_client
 from rmr_agent.utils import preprocess_python_file
 from rmr_agent.utils.logging_config import setup_logger
 
 # Set up module logger
 logger = setup_logger(__name__)
 
-def summarize_code(python_file_path, full_file_list):
-    base_name = os.path.basename(python_file_path)  
-    file_name = base_name.replace('.py', '.ipynb')
+# Concurrent summarization requests per summarize_codes call
+SUMMARIZATION_MAX_WORKERS = int(os.getenv("SUMMARIZATION_MAX_WORKERS", "8"))
+# Small files are packed into one request, up to this many files and cleaned lines per request
+SUMMARIZATION_FILES_PER_REQUEST = int(os.getenv("SUMMARIZATION_FILES_PER_REQUEST", "4"))
+SUMMARIZATION_BATCH_MAX_LINES = int(os.getenv("SUMMARIZATION_BATCH_MAX_LINES", "300"))
+# Completion token limit of the deployment; a packed request's budget is capped at it
+SUMMARIZATION_MAX_COMPLETION_TOKENS = int(os.getenv("SUMMARIZATION_MAX_COMPLETION_TOKENS", "4096"))
 
-    cleaned_code = preprocess_python_file(python_file_path)
-    line_count = len(cleaned_code.splitlines())  
-    logger.info("Summarizing code for file %s which has ~%d lines of code", file_name, line_count)
-    summarization_prompt = f"""Analyze the following machine learning Python code and provide a practical summary of each major code block. Do not include an overall summary or draw conclusions beyond what each block explicitly does. Include only MAJOR code blocks or logical sections. Ignore code which is commented out. Do not include any code in the output — provide only concise, descriptive summaries in plain English.
+# "### File <number>: <file name>" header that starts each file's section of a packed response
+_BATCH_HEADER_RE = re.compile(r"^#+[ \t]*\**[ \t]*File (\d+):[ \t]*(.*?)[ \t*]*$", re.MULTILINE)
 
-Full File List:
-{full_file_list}
-
-Current File's Name:
-{file_name}
-
-Current File's Content:
-{cleaned_code}
+@functools.lru_cache(maxsize=8)
+def _summarization_prompt_prefix(full_file_list_text):
+    """Instructions, file list and output format: the part of the prompt that is the same for every file of a repo."""
+    return f"""Analyze the following machine learning Python code and provide a practical summary of each major code block. Do not include an overall summary or draw conclusions beyond what each block explicitly does. Include only MAJOR code blocks or logical sections. Ignore code which is commented out. Do not include any code in the output — provide only concise, descriptive summaries in plain English.
 
 Output Format (for each major code block):
 **[Brief few-word summary of what this block does] (Lines [start_line]-[end_line]):**
 - [Brief, practical bullet points going into slightly more detail]
 
+Full File List:
+{full_file_list_text}
+
 """
-    llm_client = LLMClient()
+
+def _display_name(python_file_path):
+    return os.path.basename(python_file_path).replace('.py', '.ipynb')
+
+def _request_summary(prompt, max_tokens):
+    llm_client = get_llm_client()
     response: litellm.types.utils.ModelResponse = llm_client.call_llm(
-        prompt=summarization_prompt,
-        max_tokens=2048,
+        prompt=prompt,
+        max_tokens=max_tokens,
         temperature=0.0,
         repetition_penalty=1.0,
         top_p=0.3,
     )
     choices: litellm.types.utils.Choices = response.choices
-    summary = choices[0].message.content or ""
+    return choices[0].message.content or ""
+
+def _summarize_cleaned_code(python_file_path, cleaned_code, full_file_list):
+    file_name = _display_name(python_file_path)
+    # Everything shared by the files of one run comes first, so the provider's prompt cache can reuse it
+    summarization_prompt = _summarization_prompt_prefix(str(full_file_list)) + f"""Current File's Name:
+{file_name}
+
+Current File's Content:
+{cleaned_code}
+"""
+    summary = _request_summary(summarization_prompt, max_tokens=2048)
     if not summary:
         raise ValueError(f"Summary for {file_name} is empty")
-    return cleaned_code, summary
+    return summary
+
+def _preprocess(python_file_path):
+    cleaned_code = preprocess_python_file(python_file_path)
+    logger.info("Summarizing code for file %s which has ~%d lines of code",
+                _display_name(python_file_path), len(cleaned_code.splitlines()))
+    return cleaned_code
+
+def summarize_code(python_file_path, full_file_list):
+    cleaned_code = _preprocess(python_file_path)
+    return cleaned_code, _summarize_cleaned_code(python_file_path, cleaned_code, full_file_list)
+
+def _summarize_batch(batch, full_file_list):
+    """
+    Summarizes several small files with a single LLM request.
+    Falls back to one request per file if the response cannot be split back into per-file summaries.
+    :param batch: List of (python_file_path, cleaned_code) tuples.
+    :return: List of summaries in batch order.
+    """
+    if len(batch) == 1:
+        python_file_path, cleaned_code = batch[0]
+        return [_summarize_cleaned_code(python_file_path, cleaned_code, full_file_list)]
+
+    files_text = "\n".join(
+        f"""File {index}: {_display_name(python_file_path)}
+
+File {index}'s Content:
+{cleaned_code}
+"""
+        for index, (python_file_path, cleaned_code) in enumerate(batch, start=1)
+    )
+    summarization_prompt = _summarization_prompt_prefix(str(full_file_list)) + f"""The following {len(batch)} files are summarized together. Line numbers are relative to each file's own content. Start the summary of each file with a header line of the form `### File <number>: <file name>`, in the order given, and summarize every file.
+
+{files_text}"""
+    response = _request_summary(
+        summarization_prompt, max_tokens=min(2048 * len(batch), SUMMARIZATION_MAX_COMPLETION_TOKENS)
+    )
+
+    summaries = _split_batch_summary(response, batch)
+    if summaries is None:
+        logger.warning("Could not split batched summary of %d files, summarizing them one by one", len(batch))
+        return [
+            _summarize_cleaned_code(python_file_path, cleaned_code, full_file_list)
+            for python_file_path, cleaned_code in batch
+        ]
+    return summaries
+
+def _split_batch_summary(response, batch):
+    """
+    Splits a packed response into per-file summaries.
+    :return: List of summaries in batch order, or None unless there is exactly one non-empty
+             section per file, in order, each headed by its file's name.
+    """
+    sections = _BATCH_HEADER_RE.split(response)
+    # split() with two capture groups yields [preamble, number, name, text, number, name, text, ...]
+    numbers, names, texts = sections[1::3], sections[2::3], [text.strip() for text in sections[3::3]]
+    expected_numbers = [str(index) for index in range(1, len(batch) + 1)]
+    expected_names = [_display_name(python_file_path) for python_file_path, _ in batch]
+    if numbers != expected_numbers or not all(texts):
+        return None
+    if any(expected_name not in name for name, expected_name in zip(names, expected_names)):
+        return None
+    return texts
+
+def _batch_files(python_file_paths, cleaned_codes, files_per_request, max_batch_lines):
+    """Groups consecutive files into batches of at most files_per_request files and max_batch_lines lines."""
+    batches, batch, batch_lines = [], [], 0
+    for python_file_path, cleaned_code in zip(python_file_paths, cleaned_codes):
+        line_count = len(cleaned_code.splitlines())
+        if batch and (len(batch) >= files_per_request or batch_lines + line_count > max_batch_lines):
+            batches.append(batch)
+            batch, batch_lines = [], 0
+        batch.append((python_file_path, cleaned_code))
+        batch_lines += line_count
+    if batch:
+        batches.append(batch)
+    return batches
 
-    
\ No newline at end of file
+def summarize_codes(python_file_paths, full_file_list, max_workers=SUMMARIZATION_MAX_WORKERS,
+                    files_per_request=SUMMARIZATION_FILES_PER_REQUEST,
+                    max_batch_lines=SUMMARIZATION_BATCH_MAX_LINES):
+    """
+    Summarizes several files, packing small files into shared LLM requests and sending the
+    requests concurrently through one client.
+    Yields (python_file_path, cleaned_code, summary) in input order as results become available.
+    """
+    python_file_paths = list(python_file_paths)
+    cleaned_codes = [_preprocess(python_file_path) for python_file_path in python_file_paths]
+    batches = _batch_files(python_file_paths, cleaned_codes, files_per_request, max_batch_lines)
+    logger.info("Summarizing %d files with %d LLM requests", len(python_file_paths), len(batches))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch, summaries in zip(batches, executor.map(
+            lambda batch: _summarize_batch(batch, full_file_list), batches
+        )):
+            for (python_file_path, cleaned_code), summary in zip(batch, summaries):
+                yield python_file_path, cleaned_code, summary
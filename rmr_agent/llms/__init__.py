@@ -1,2 +1,2 @@
 from .codepal import call_codepal_gpt
-from .llm_handler import LLMClient
\ No newline at end of file
+from .llm_handler import LLMClient, get_llm_client
\ No newline at end of file
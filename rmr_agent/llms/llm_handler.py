@@ -1,5 +1,9 @@
 
 import os
+import json
+import hashlib
+import tempfile
+import threading
 import requests
 import time
 import warnings
@@ -10,7 +14,7 @@ import logging
 from typing import Dict, Any, Optional
 from abc import ABC, abstractmethod
 from urllib3.exceptions import InsecureRequestWarning
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 from dotenv import load_dotenv
@@ -34,6 +38,12 @@ open_models = {
 }
 
 
+# On-disk cache of deterministic (temperature == 0) LLM responses, keyed by request content.
+# Only used by calls that pass use_cache=True; set LLM_CACHE_ENABLED=false to always call the endpoint.
+LLM_CACHE_DIR = os.path.expanduser(os.getenv("LLM_CACHE_DIR", "~/.cache/rmr_agent/llm"))
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+
+
 def messages_to_prompt(messages: list[dict[str, str]]) -> str:
     """Convert messages to a prompt string."""
     prompt_pieces = []
@@ -135,6 +145,16 @@ class LLMHandler(ABC):
     def extract_response(self, response: requests.Response, model_name: str, input_tokens: int) -> litellm.ModelResponse:
         pass
 
+    @property
+    def supports_streaming(self) -> bool:
+        """Whether the endpoint can stream; such handlers implement iter_stream_content(response) -> Iterator[str]."""
+        return False
+
+    @property
+    def supports_json_mode(self) -> bool:
+        """Whether create_payload honours response_format={"type": "json_object"}."""
+        return False
+
 
 class OpenSourceLLMHandler(LLMHandler):
     @property
@@ -200,6 +220,14 @@ class AzureGPTHandler(LLMHandler):
     def needs_prompt_conversion(self) -> bool:
         return False
     
+    @property
+    def supports_streaming(self) -> bool:
+        return True
+
+    @property
+    def supports_json_mode(self) -> bool:
+        return True
+
     def create_payload(self, prompt: str = "", messages: list = None, **kwargs) -> Dict[str, Any]:
         if not messages:
             raise ValueError('Need to provide messages to create payload for Azure GPT')
@@ -215,6 +243,8 @@ class AzureGPTHandler(LLMHandler):
             "presence_penalty": kwargs.get('presence_penalty', 0),  
 
         }
+        if kwargs.get('response_format'):
+            payload["response_format"] = kwargs['response_format']
         return payload 
     
     def create_headers(self):
@@ -232,6 +262,20 @@ class AzureGPTHandler(LLMHandler):
         }
         return params
     
+    def iter_stream_content(self, response: requests.Response) -> Iterator[str]:
+        # Server-sent events: one "data: {json}" line per chunk, terminated by "data: [DONE]"
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if not chunk.get("choices"):
+                continue
+            content = (chunk["choices"][0].get("delta") or {}).get("content")
+            if content:
+                yield content
     
     def extract_response(self, response: requests.Response, model_name: str, input_tokens: int) -> litellm.ModelResponse:
         response_json = response.json()
@@ -284,12 +328,7 @@ class LLMClient:
             self.handler = AzureGPTHandler()
             self.url = os.getenv("GENAI_API_URL")# "http://10.183.170.134:8001/api/llm/" # "http://10.183.170.134:8001/api/llm/" # codepal LLM endpoint  # "http://host.docker.internal:8001/api/llm/"
     
-    def call_llm(self, 
-                 prompt: str = "",
-                 messages: List[Dict[str, str]] = [],
-                 input_tokens: int = 0,
-                 **kwargs) -> litellm.types.utils.ModelResponse:
-        
+    def _build_request(self, prompt: str, messages: List[Dict[str, str]], kwargs: Dict[str, Any]):
         if not prompt and not messages:
             raise ValueError("Please provide either a single prompt string or list of messages")
         elif prompt and messages:
@@ -305,25 +344,174 @@ class LLMClient:
         else:
             kwargs['messages'] = messages
 
-        if input_tokens == 0:
-            input_tokens: int = litellm.utils.token_counter(messages=messages, model=self.model_name) # defaults to tiktoken general token counter if that model name does not match
-            
         # Create request components
         payload = self.handler.create_payload(**kwargs)
         headers = self.handler.create_headers()
         params = self.handler.create_params()
+        return messages, payload, headers, params
+
+    def _cache_path(self, payload: Dict[str, Any]) -> str:
+        request_key = json.dumps({"model": self.model_name, "url": self.url, "payload": payload}, sort_keys=True)
+        return os.path.join(LLM_CACHE_DIR, hashlib.sha256(request_key.encode("utf-8")).hexdigest() + ".json")
+
+    def _partial_cache_path(self, cache_path: str) -> str:
+        return cache_path[:-len(".json")] + ".partial.json"
+
+    def _load_cached_response(self, cache_path: str) -> Optional[litellm.types.utils.ModelResponse]:
+        try:
+            with open(cache_path, "r") as f:
+                return litellm.utils.ModelResponse(**json.load(f))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Ignoring unreadable LLM cache entry %s: %s", cache_path, e)
+            return None
+
+    def _store_cached_response(self, cache_path: str, response: litellm.types.utils.ModelResponse):
+        try:
+            os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+            # Write to a temp file and rename so concurrent readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=LLM_CACHE_DIR, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(response.model_dump(), f)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            logger.warning("Failed to write LLM cache entry %s: %s", cache_path, e)
+
+    def _store_streamed_response(self, cache_path: str, messages: List[Dict[str, str]], chunks: List[str]):
+        response_text = "".join(chunks)
+        try:
+            input_tokens = litellm.utils.token_counter(messages=messages, model=self.model_name)
+            completion_tokens = litellm.utils.token_counter(text=response_text, model=self.model_name)
+            response = litellm.utils.ModelResponse(
+                choices=[{
+                    "finish_reason": "stop",
+                    "index": 0,
+                    "message": {"role": "assistant", "content": response_text}
+                }],
+                created=int(time.time()),
+                model=self.model_name,
+                usage={
+                    "prompt_tokens": input_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": input_tokens + completion_tokens
+                }
+            )
+        except Exception as e:
+            logger.warning("Failed to build LLM cache entry %s: %s", cache_path, e)
+            return
+        self._store_cached_response(cache_path, response)
+
+    def call_llm(self, 
+                 prompt: str = "",
+                 messages: List[Dict[str, str]] = [],
+                 input_tokens: int = 0,
+                 use_cache: bool = False,
+                 **kwargs) -> litellm.types.utils.ModelResponse:
+        
+        messages, payload, headers, params = self._build_request(prompt, messages, kwargs)
+
+        # Deterministic requests are served from the on-disk cache when an identical one was made before
+        cache_path = None
+        if use_cache and LLM_CACHE_ENABLED and kwargs.get('temperature', 0.0) == 0:
+            cache_path = self._cache_path(payload)
+            cached_response = self._load_cached_response(cache_path)
+            if cached_response is not None:
+                logger.debug("LLM cache hit: %s", cache_path)
+                return cached_response
+
+        if input_tokens == 0:
+            input_tokens: int = litellm.utils.token_counter(messages=messages, model=self.model_name) # defaults to tiktoken general token counter if that model name does not match
         
         # Call LLM without SSL verification
-        with no_ssl_verification():
-            session = requests.Session()
+        with no_ssl_verification(), requests.Session() as session:
             response = session.post(self.url, json=payload, params=params, headers=headers)
             #response = requests.post(self.url, json=payload, params=params, headers=headers, verify=False)
             
         if response.status_code != 200:
             raise Exception(f'Failed to send POST request. Status code: {response.status_code}, Response text: {response.text}')
             
-        return self.handler.extract_response(response, self.model_name, input_tokens)
-    
+        model_response = self.handler.extract_response(response, self.model_name, input_tokens)
+        if cache_path:
+            self._store_cached_response(cache_path, model_response)
+        return model_response
+
+    def call_llm_stream(self,
+                        prompt: str = "",
+                        messages: List[Dict[str, str]] = [],
+                        use_cache: bool = False,
+                        **kwargs) -> Iterator[str]:
+        """
+        Yield the response text as it is generated, so callers can start parsing
+        (or stop reading) before the full completion has arrived.
+
+        Handlers without streaming support yield the whole response text once.
+        """
+        if not self.handler.supports_streaming:
+            response = self.call_llm(prompt=prompt, messages=messages, use_cache=use_cache, **kwargs)
+            yield response.choices[0].message.content or ""
+            return
+
+        messages, payload, headers, params = self._build_request(prompt, messages, kwargs)
+
+        # Cache entries are keyed on the non-streaming payload so both call paths share them
+        cache_path = None
+        cached_text = ""
+        if use_cache and LLM_CACHE_ENABLED and kwargs.get('temperature', 0.0) == 0:
+            cache_path = self._cache_path(payload)
+            cached_response = self._load_cached_response(cache_path)
+            if cached_response is not None:
+                logger.debug("LLM cache hit: %s", cache_path)
+                yield cached_response.choices[0].message.content or ""
+                return
+            # A partial entry holds the text an earlier caller read before it stopped early
+            partial_response = self._load_cached_response(self._partial_cache_path(cache_path))
+            if partial_response is not None:
+                logger.debug("LLM partial cache hit: %s", cache_path)
+                cached_text = partial_response.choices[0].message.content or ""
+                yield cached_text
+
+        stream_payload = {**payload, "stream": True}
+
+        # Past a partial cache hit, only request the rest if the caller keeps reading;
+        # the text it already received is skipped in the live stream
+        skip = len(cached_text)
+        chunks = []
+        with no_ssl_verification(), requests.Session() as session:
+            with session.post(self.url, json=stream_payload, params=params, headers=headers, stream=True) as response:
+                if response.status_code != 200:
+                    raise Exception(f'Failed to send POST request. Status code: {response.status_code}, Response text: {response.text}')
+                try:
+                    for content in self.handler.iter_stream_content(response):
+                        chunks.append(content)
+                        if skip >= len(content):
+                            skip -= len(content)
+                            continue
+                        content, skip = content[skip:], 0
+                        yield content
+                except GeneratorExit:
+                    # The caller stopped early (e.g. once its JSON object was complete). Keep what was
+                    # read as a partial entry and return without reading the rest of the stream.
+                    if cache_path and sum(map(len, chunks)) > len(cached_text):
+                        self._store_streamed_response(self._partial_cache_path(cache_path), messages, chunks)
+                    raise
+
+        if cache_path:
+            self._store_streamed_response(cache_path, messages, chunks)
+
+
+_default_client: Optional[LLMClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """Return a process-wide LLMClient for the configured model, creating it on first use."""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = LLMClient()
+    return _default_client
 
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join
+(os.path.dirname(__file__), '../../')))
+
+from rmr_agent.agents.component_parsing import drop_contained_components, _parse_line_range
+
+
+def components(**line_ranges):
+    return {name: {"line_range": line_range} for name, line_range in line_ranges.items()}
+
+
+def test_parse_line_range_merges_segments():
+    assert _parse_line_range("Lines 20-30, 1-10") == ((1, 10), (20, 30))
+    assert _parse_line_range("Lines 1-10, 11-15") == ((1, 15),)
+    assert _parse_line_range("Lines unknown") is None
+
+
+def test_multi_segment_range_contained_in_covering_range():
+    parsed = drop_contained_components(components(split="Lines 1-10, 20-30", whole="Lines 1-30"))
+    assert list(parsed) == ["whole"]
+
+
+def test_multi_segment_range_keeps_components_in_its_gaps():
+    parsed = drop_contained_components(components(split="Lines 1-10, 20-30", gap="Lines 12-18", inside="Lines 22-28"))
+    assert list(parsed) == ["split", "gap"]
+
+
+def test_range_spanning_segments_is_not_contained_in_either():
+    parsed = drop_contained_components(components(split="Lines 1-10, 20-30", across="Lines 5-25"))
+    assert list(parsed) == ["split", "across"]
+
+
+def test_equal_ranges_keep_first_component():
+    parsed = drop_contained_components(components(first="Lines 5-15", second="Lines 5 - 15"))
+    assert list(parsed) == ["first"]
+
+
+def test_unparseable_ranges_are_kept():
+    parsed = components(whole="Lines 1-100", unknown="Lines unknown", missing=None)
+    assert list(drop_contained_components(parsed)) == ["whole", "unknown", "missing"]
@@ -0,0 +1,78 @@
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join
+(os.path.dirname(__file__), '../../')))
+
+import yaml
+
+from rmr_agent.agents.edge_identification import (
+    identify_strict_edges_from_dicts, build_name_to_outputs, _strict_edges_for_nodes_yaml
+)
+from rmr_agent.utils import dict_to_yaml
+
+# Shared component names, list/dict values, equal values of different types (1 == 1.0) and None outputs
+NODES_YAML = """
+- Data Loading:
+    inputs: {config: {bucket: gs://bucket, splits: [train, test]}}
+    outputs: {raw_path: gs://bucket/raw.parquet, columns: [id, amount], version: 1}
+- Preprocessing:
+    inputs: {data: gs://bucket/raw.parquet, cols: [id, amount], model_version: 1.0}
+    outputs: {clean_path: gs://bucket/clean.parquet, empty: null}
+- Preprocessing:
+    inputs: {data: gs://bucket/raw.parquet}
+    outputs: {features_path: gs://bucket/features.parquet}
+- Model Training:
+    inputs: {train: gs://bucket/clean.parquet, features: gs://bucket/features.parquet, none: null, cols: [id, amount]}
+    outputs: {model_path: gs://bucket/model.txt}
+- Config:
+    inputs: {}
+    outputs: {config: {splits: [train, test], bucket: gs://bucket}}
+- Self Loop:
+    inputs: {path: gs://bucket/self.txt}
+    outputs: {path: gs://bucket/self.txt}
+"""
+
+
+def pairwise_strict_edges(nodes_dict_list):
+    """Comparison of every output of every node against every input of every other node."""
+    nodes = [(name, data.get('inputs') or {}, data.get('outputs') or {})
+             for node in nodes_dict_list for name, data in node.items()]
+    edges_map = {}
+    for source_idx, (source_name, _, source_outputs) in enumerate(nodes):
+        for target_idx, (target_name, target_inputs, _) in enumerate(nodes):
+            if source_idx == target_idx:
+                continue
+            matching = {}
+            for out_name, out_value in source_outputs.items():
+                if out_value is None:
+                    continue
+                for in_value in target_inputs.values():
+                    if out_value == in_value:
+                        matching[out_name] = out_value
+            if matching:
+                edge = edges_map.setdefault((source_name, target_name), {'from': source_name, 'to': target_name, 'attributes': {}})
+                edge['attributes'].update(matching)
+    return list(edges_map.values())
+
+
+def test_strict_edges_match_pairwise_scan():
+    nodes_dict_list = yaml.safe_load(NODES_YAML)
+    edges = identify_strict_edges_from_dicts(nodes_dict_list)
+    assert edges == pairwise_strict_edges(nodes_dict_list)
+    assert [list(edge['attributes']) for edge in edges] == [
+        list(edge['attributes']) for edge in pairwise_strict_edges(nodes_dict_list)
+    ]
+    assert {'from': 'Config', 'to': 'Data Loading', 'attributes': {'config': {'splits': ['train', 'test'], 'bucket': 'gs://bucket'}}} in edges
+    assert not any(edge['from'] == edge['to'] == 'Self Loop' for edge in edges)
+
+
+def test_strict_edges_for_nodes_yaml_matches_pairwise_scan():
+    nodes_dict_list = yaml.safe_load(NODES_YAML)
+    name_to_outputs, strict_edges_yaml = _strict_edges_for_nodes_yaml(NODES_YAML)
+    assert strict_edges_yaml == dict_to_yaml({'edges': pairwise_strict_edges(nodes_dict_list)})
+    # The first occurrence of a shared name wins
+    assert name_to_outputs == build_name_to_outputs(nodes_dict_list)
+    assert name_to_outputs['Preprocessing'] == {'clean_path': 'gs://bucket/clean.parquet', 'empty': None}
+    # Cached per YAML string
+    assert _strict_edges_for_nodes_yaml(NODES_YAML)[1] is strict_edges_yaml
@@ -0,0 +1,14 @@
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join
+(os.path.dirname(__file__), '../../')))
+
+from rmr_agent.agents.ini_config import parse_env_ini
+
+def test_parse_env_ini_indented_lines():
+    env_ini = "[general]\nuser = david\n  continued = yes\n    model_path = /tmp/model\n"
+    assert parse_env_ini(env_ini) == {"user": "david", "continued": "yes", "model_path": "/tmp/model"}
+
+def test_parse_env_ini_without_section():
+    assert parse_env_ini("user = david\n  continued = yes") == {"user": "david", "continued": "yes"}
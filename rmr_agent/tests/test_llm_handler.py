@@ -0,0 +1,104 @@
+
+import sys
+import os
+import contextlib
+sys.path.insert(0, os.path.abspath(os.path.join
+(os.path.dirname(__file__), '../../')))
+
+from rmr_agent.llms import llm_handler
+from rmr_agent.llms.llm_handler import LLMClient
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self):
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self):
+        self.responses = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def post(self, *args, **kwargs):
+        response = FakeResponse()
+        self.responses.append(response)
+        return response
+
+
+class FakeStreamingHandler:
+    supports_streaming = True
+    needs_prompt_conversion = False
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.read = []
+
+    def create_payload(self, **kwargs):
+        return kwargs
+
+    def create_headers(self):
+        return {}
+
+    def create_params(self):
+        return {}
+
+    def iter_stream_content(self, response):
+        for chunk in self.chunks:
+            self.read.append(chunk)
+            yield chunk
+
+
+def make_client(monkeypatch, tmp_path, chunks):
+    monkeypatch.setattr(llm_handler, "LLM_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(llm_handler, "no_ssl_verification", contextlib.nullcontext)
+    sessions = []
+
+    def session_factory():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    monkeypatch.setattr(llm_handler.requests, "Session", session_factory)
+    client = LLMClient()
+    client.handler = FakeStreamingHandler(chunks)
+    return client, sessions
+
+
+def test_stream_break_does_not_read_rest_of_stream(monkeypatch, tmp_path):
+    client, sessions = make_client(monkeypatch, tmp_path, ['{"a": 1}', " trailing", " tokens"])
+    for delta in client.call_llm_stream(prompt="parse", temperature=0.0, use_cache=True):
+        break
+    assert client.handler.read == ['{"a": 1}']
+    assert sessions[0].responses[0].closed
+
+
+def test_stream_continues_after_partial_cache_entry(monkeypatch, tmp_path):
+    client, sessions = make_client(monkeypatch, tmp_path, ['{"a": 1}', " trailing", " tokens"])
+    for delta in client.call_llm_stream(prompt="parse", temperature=0.0, use_cache=True):
+        break
+
+    # The partial entry is served without a request while the caller stops at the same point
+    deltas = client.call_llm_stream(prompt="parse", temperature=0.0, use_cache=True)
+    assert next(deltas) == '{"a": 1}'
+    deltas.close()
+    assert len(sessions) == 1
+
+    # Reading on fetches the rest without repeating the text already served
+    text = "".join(client.call_llm_stream(prompt="parse", temperature=0.0, use_cache=True))
+    assert text == '{"a": 1} trailing tokens'
+
+    # The full response is cached now
+    client.handler.chunks = []
+    assert "".join(client.call_llm_stream(prompt="parse", temperature=0.0, use_cache=True)) == text
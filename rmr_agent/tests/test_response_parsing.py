@@ -0,0 +1,33 @@
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join
+(os.path.dirname(__file__), '../../')))
+
+import yaml
+
+from rmr_agent.utils import dict_to_yaml, yaml_to_dict
+
+DAG = {
+    "nodes": [
+        {"Model Training": {
+            "file": "train.ipynb",
+            "line_range": "Lines 10-50, 60-80",
+            "code": "def train():\n    return model.fit(x)\n",
+            "description": "Fits the model " * 12,
+            "inputs": {"features_path": "gs://bucket/features.parquet", "flag": "yes", "empty": ""},
+            "outputs": {"model_path": "gs://bucket/model.txt", "epochs": 10, "rate": 0.5, "done": True, "notes": None},
+        }},
+    ],
+    "edges": [
+        {"from": "Data Loading", "to": "Model Training", "attributes": {"features_path": "gs://bucket/features.parquet"}},
+    ],
+}
+
+
+def test_dict_to_yaml_round_trips():
+    assert yaml_to_dict(dict_to_yaml(DAG)) == DAG
+
+
+def test_dict_to_yaml_output_matches_default_dumper():
+    assert dict_to_yaml(DAG) == yaml.dump(DAG, default_flow_style=False, sort_keys=False)
@@ -0,0 +1,68 @@
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join
+(os.path.dirname(__file__), '../../')))
+
+from rmr_agent.agents import summarization
+
+BATCH = [("repo/load_data.py", "import pandas\n"), ("repo/train.py", "model.fit()\n")]
+
+
+def fake_requests(monkeypatch, batched_response):
+    prompts = []
+
+    def request_summary(prompt, max_tokens):
+        prompts.append(prompt)
+        if len(prompts) == 1:
+            return batched_response
+        return f"single summary {len(prompts) - 1}"
+
+    monkeypatch.setattr(summarization, "_request_summary", request_summary)
+    return prompts
+
+
+def test_batch_summary_well_formed(monkeypatch):
+    prompts = fake_requests(monkeypatch, (
+        "### File 1: load_data.ipynb\n"
+        "**Load data (Lines 1-1):**\n- Imports pandas\n"
+        "### File 2: `train.ipynb`\n"
+        "**Train (Lines 1-1):**\n- File 2: fits the model\n"
+    ))
+    summaries = summarization._summarize_batch(BATCH, ["load_data.py", "train.py"])
+    assert summaries == [
+        "**Load data (Lines 1-1):**\n- Imports pandas",
+        "**Train (Lines 1-1):**\n- File 2: fits the model",
+    ]
+    assert len(prompts) == 1
+
+
+def test_batch_summary_missing_section_falls_back(monkeypatch):
+    prompts = fake_requests(monkeypatch, (
+        "### File 1: load_data.ipynb\n"
+        "**Load data (Lines 1-1):**\n- Imports pandas\n"
+    ))
+    summaries = summarization._summarize_batch(BATCH, ["load_data.py", "train.py"])
+    assert summaries == ["single summary 1", "single summary 2"]
+    assert len(prompts) == 3
+
+
+def test_batch_summary_duplicated_section_falls_back(monkeypatch):
+    prompts = fake_requests(monkeypatch, (
+        "### File 1: load_data.ipynb\n"
+        "**Load data (Lines 1-1):**\n- Imports pandas\n"
+        "### File 2: train.ipynb\n"
+        "**Train (Lines 1-1):**\n- Fits the model\n"
+        "### File 2: train.ipynb\n"
+        "**Train again (Lines 1-1):**\n- Fits the model\n"
+    ))
+    summaries = summarization._summarize_batch(BATCH, ["load_data.py", "train.py"])
+    assert summaries == ["single summary 1", "single summary 2"]
+    assert len(prompts) == 3
+
+
+def test_batch_files_respects_file_and_line_limits():
+    paths = ["a.py", "b.py", "c.py", "d.py"]
+    cleaned_codes = ["x\n" * 10, "x\n" * 10, "x\n" * 100, "x\n" * 10]
+    batches = summarization._batch_files(paths, cleaned_codes, files_per_request=2, max_batch_lines=50)
+    assert [[path for path, _ in batch] for batch in batches] == [["a.py", "b.py"], ["c.py"], ["d.py"]]
@@ -1,5 +1,5 @@
 from .clean_code import preprocess_python_file
-from .response_parsing import convert_to_dict, list_to_yaml_string, yaml_to_dict, dict_to_yaml
+from .response_parsing import convert_to_dict, list_to_yaml_string, yaml_to_dict, dict_to_yaml, JsonObjectTracker
 from .checkpointing import *
 from .git_utils import parse_github_url, fork_and_clone_repo, push_refactored_code, create_rmr_agent_pull_request
 from .convert_ipynb_to_py import convert_notebooks
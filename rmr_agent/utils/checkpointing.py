@@ -1,13 +1,37 @@
 import os
 import json
 import glob
+import stat
+import tempfile
+import yaml
 import logging
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Iterator
 from .logging_config import setup_logger
+from .response_parsing import SafeLoader
 
 # Set up module logger
 logger = setup_logger(__name__)
 
+def write_file_atomically(path: str, content: str):
+    """Write content to a temp file next to path and rename it over path, so readers never see a partial file."""
+    # A unique temp file per call, so concurrent writers to the same path cannot clobber each other's
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+        # mkstemp creates the file as 0600; keep the destination's mode, or make new files 0644
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
 def get_next_run_id(checkpoint_base_path: str, repo_name: str) -> int:
     run_pattern = f"{checkpoint_base_path}/{repo_name}/run_*"
     existing_runs = glob.glob(run_pattern)
@@ -45,6 +69,16 @@ def load_step_output(checkpoint_base_path: str, repo_name: str, step: str, run_i
         return output
     raise FileNotFoundError(f"Checkpoint not found for step {step}")
 
+def load_step_outputs(checkpoint_base_path: str, repo_name: str, steps: List[str], run_id: str, max_workers: int = 8) -> Iterator[Dict[str, Any]]:
+    """Load several steps' checkpoints concurrently, yielding the outputs in the order of `steps`."""
+    if not steps:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(steps))) as executor:
+        yield from executor.map(
+            lambda step: load_step_output(checkpoint_base_path=checkpoint_base_path, repo_name=repo_name, step=step, run_id=run_id),
+            steps
+        )
+
 def save_step_output(checkpoint_base_path: str, repo_name: str, step: str, run_id: str, output: Dict[str, Any]):
     os.makedirs(f"{checkpoint_base_path}/{repo_name}/{run_id}", exist_ok=True)
     checkpoint_path = f"{checkpoint_base_path}/{repo_name}/{run_id}/{step}.json"
@@ -59,9 +93,8 @@ def save_step_output(checkpoint_base_path: str, repo_name: str, step: str, run_i
             if step == "human_verification_of_dag" and "verified_dag" in existing_content and "verified_dag" in output:
                 # Check if the verified DAG YAML is the same, ignoring whitespace and format differences
                 try:
-                    import yaml
-                    existing_dag = yaml.safe_load(existing_content["verified_dag"])
-                    new_dag = yaml.safe_load(output["verified_dag"])
+                    existing_dag = yaml.load(existing_content["verified_dag"], Loader=SafeLoader)
+                    new_dag = yaml.load(output["verified_dag"], Loader=SafeLoader)
 
                     # If the parsed structures are the same, keep the original file unchanged
                     if existing_dag == new_dag:
@@ -80,7 +113,8 @@ def save_step_output(checkpoint_base_path: str, repo_name: str, step: str, run_i
             # If reading fails, continue writing the new file
 
     # If the file doesn't exist or content is different, write the file
-    with open(checkpoint_path, "w") as f:
-        # Use a consistent JSON serialization format
-        json.dump(output, f, indent=2, sort_keys=True, ensure_ascii=False)
+    # Use a consistent JSON serialization format; encode in one pass and write once
+    # rather than letting json.dump issue a write per token
+    serialized = json.dumps(output, indent=2, sort_keys=True, ensure_ascii=False)
+    write_file_atomically(checkpoint_path, serialized)
     logger.info("Saved %s output to %s", step, checkpoint_path)
\ No newline at end of file
@@ -3,6 +3,7 @@ import yaml
 from typing import Dict, List, Any, Tuple, Set
 import copy
 from rmr_agent.utils.logging_config import setup_logger
+from rmr_agent.utils.response_parsing import SafeLoader
 
 # Set up module logger
 logger = setup_logger(__name__)
@@ -140,7 +141,7 @@ def parse_dag_yaml(dag_yaml: str) -> Dict[str, Any]:
     Parse a DAG YAML string into a dictionary.
     """
     try:
-        return yaml.safe_load(dag_yaml) or {}
+        return yaml.load(dag_yaml, Loader=SafeLoader) or {}
     except Exception as e:
         logger.error(f"Error parsing DAG YAML: {e}")
         return {}
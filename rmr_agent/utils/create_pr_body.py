@@ -7,6 +7,7 @@ import re
 # Import locally to avoid circular imports
 from .correction_logging import format_component_corrections_for_pr, format_dag_corrections_for_pr
 from .logging_config import setup_logger
+from .response_parsing import SafeLoader
 
 # Set up module logger
 logger = setup_logger(__name__)
@@ -30,7 +31,7 @@ def load_yaml_data(data_source):
     if isinstance(data_source, (str, Path)) and os.path.exists(data_source): # If it's a path to a YAML file
         try:
             with open(data_source, 'r') as f:
-                return yaml.safe_load(f)
+                return yaml.load(f, Loader=SafeLoader)
         except FileNotFoundError:
             logger.warning("File not found - %s", data_source)
             return None
@@ -39,7 +40,7 @@ def load_yaml_data(data_source):
             return None
     elif isinstance(data_source, str): # If it's a YAML string
         try:
-            return yaml.safe_load(data_source)
+            return yaml.load(data_source, Loader=SafeLoader)
         except yaml.YAMLError:
             logger.warning("Could not parse YAML from string: '%s...'", data_source[:100]) # Log part of string
             return None
@@ -1,6 +1,19 @@
 import json
 import yaml
 import re
+from .logging_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# Prefer the libyaml-backed loader/dumper when PyYAML was built with it; they handle
+# the same documents as SafeLoader/SafeDumper several times faster.
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+    _HAS_LIBYAML = True
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+    _HAS_LIBYAML = False
+    logger.warning("PyYAML was built without libyaml; falling back to the slower pure-Python YAML loader and dumper")
 
 
 def convert_to_dict(json_str):
@@ -38,6 +51,46 @@ def convert_to_dict(json_str):
     
 
 
+class JsonObjectTracker:
+    """
+    Incrementally tracks brace depth over streamed text so callers can tell when
+    the first top-level JSON object has been closed without re-scanning the buffer.
+    Braces inside JSON string literals are ignored.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.started = False
+        self.complete = False
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> bool:
+        """Consume the next chunk of text. Returns True once the first object is closed."""
+        if self.complete:
+            return True
+        for ch in text:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                if self.started:
+                    self._in_string = True
+            elif ch == "{":
+                self.depth += 1
+                self.started = True
+            elif ch == "}" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+                    return True
+        return False
+
+
 def list_to_yaml_string(data_list):
     """
     Convert a list of dictionaries to a YAML-formatted string while preserving order.
@@ -49,9 +102,9 @@ def list_to_yaml_string(data_list):
         str: YAML-formatted string representation of the list of dictionaries
     """
     try:
-        # Use yaml.safe_dump to convert Python objects to YAML string
+        # Use the safe dumper to convert Python objects to YAML string
         # Set sort_keys=False to preserve the order of dictionary keys
-        yaml_string = yaml.safe_dump(data_list, sort_keys=False)
+        yaml_string = yaml.dump(data_list, Dumper=SafeDumper, sort_keys=False)
         return yaml_string
     except Exception as e:
         print(f"Error converting to YAML string: {e}")
@@ -108,7 +161,7 @@ def yaml_to_dict(yaml_str: str):
 
     if content_to_parse:
         try:
-            return yaml.safe_load(content_to_parse)
+            return yaml.load(content_to_parse, Loader=SafeLoader)
         except yaml.YAMLError as e:
             print(f"Error parsing YAML from {source_of_content}: {e}")
             print(f"--- Content that failed to parse ---\n{content_to_parse}\n------------------------------------")
@@ -123,4 +176,4 @@ def yaml_to_dict(yaml_str: str):
     
 def dict_to_yaml(data):
     """Convert dictionary back to YAML string."""
-    return yaml.dump(data, default_flow_style=False, sort_keys=False)
\ No newline at end of file
+    return yaml.dump(data, Dumper=SafeDumper, default_flow_style=False, sort_keys=False)
\ No newline at end of file
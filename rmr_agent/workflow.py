@@ -10,9 +10,10 @@ from typing import Dict, Any, List
 from concurrent.futures import ThreadPoolExecutor
 from rmr_agent.utils import (
     fork_and_clone_repo, parse_github_url, convert_notebooks,
-    get_next_run_id, load_step_output, save_step_output,
-    save_ini_file
+    get_next_run_id, load_step_outputs, save_step_output, write_file_atomically,
+    save_ini_file, dict_to_yaml
 )
+from rmr_agent.utils.response_parsing import SafeLoader
 import time
 from rmr_agent.utils.logging_config import setup_logger
 
@@ -50,25 +51,18 @@ def summarize(state: WorkflowState) -> Dict[str, Any]:
     if "summaries" in state and state["summaries"]:
         logger.info("Skipping summarize: 'summaries' already in state")
         return {}
-    from rmr_agent.agents.summarization import summarize_code
+    from rmr_agent.agents.summarization import summarize_codes
     full_file_list = state["files"]
     summaries = {}
     cleaned_code = {}
 
-    with ThreadPoolExecutor() as executor:
-        # Map processing across threads using a lambda
-        results = executor.map(
-            lambda file: (file, *summarize_code(file, full_file_list)),
-            full_file_list
-        )
-
-        for file, clean_code, summary_text in results:
-            if is_cancelled(state):
-                logger.warning("Workflow cancelled during code summarization")
-                return {}
-            summaries[file] = summary_text
-            cleaned_code[file] = clean_code
-            logger.info(f"Generated summary for {file}")
+    for file, clean_code, summary_text in summarize_codes(full_file_list, full_file_list):
+        if is_cancelled(state):
+            logger.warning("Workflow cancelled during code summarization")
+            return {}
+        summaries[file] = summary_text
+        cleaned_code[file] = clean_code
+        logger.info(f"Generated summary for {file}")
 
     return {
         "summaries": summaries,
@@ -302,8 +296,7 @@ def generate_dag_yaml(state: WorkflowState) -> Dict[str, Any]:
 
         dag_yaml_path = os.path.join(CHECKPOINT_BASE_PATH, state['repo_name'], state['run_id'], "dag.yaml")
         try:
-            with open(dag_yaml_path, 'w') as yaml_file:
-                yaml_file.write(dag_yaml_str)
+            write_file_atomically(dag_yaml_path, dag_yaml_str)
             logger.info(f"Verified DAG YAML successfully exported to {dag_yaml_path}")
         except Exception as e:
             logger.error(f"Error exporting verified YAML to {dag_yaml_path}: {type(e).__name__}: {str(e)}")
@@ -319,7 +312,7 @@ def generate_dag_yaml(state: WorkflowState) -> Dict[str, Any]:
     dag_yaml_str = generage_dag_yaml(aggregated_nodes=state["node_aggregator"], edges=state["edges"])
 
     # Clean the DAG to remove any component_details that might have been added
-    dag_data = yaml.safe_load(dag_yaml_str)
+    dag_data = yaml.load(dag_yaml_str, Loader=SafeLoader)
     if dag_data and "nodes" in dag_data:
         cleaned_nodes = []
         for node in dag_data["nodes"]:
@@ -334,12 +327,11 @@ def generate_dag_yaml(state: WorkflowState) -> Dict[str, Any]:
         dag_data["nodes"] = cleaned_nodes
 
         # Convert back to YAML
-        dag_yaml_str = yaml.dump(dag_data, sort_keys=False, default_flow_style=False)
+        dag_yaml_str = dict_to_yaml(dag_data)
 
     dag_yaml_path = os.path.join(CHECKPOINT_BASE_PATH, state['repo_name'], state['run_id'], "dag.yaml")
     try:
-        with open(dag_yaml_path, 'w') as yaml_file:
-            yaml_file.write(dag_yaml_str)
+        write_file_atomically(dag_yaml_path, dag_yaml_str)
         logger.info(f"DAG YAML successfully exported to {dag_yaml_path}")
     except Exception as e:
         logger.error(f"Error exporting YAML to {dag_yaml_path}: {type(e).__name__}: {str(e)}")
@@ -433,8 +425,8 @@ def human_verification_of_dag(state: WorkflowState) -> Dict[str, Any]:
                 # Try to compare YAML content (ignoring format differences)
                 import yaml
                 try:
-                    original_parsed = yaml.safe_load(original_dag_for_verification)
-                    verified_parsed = yaml.safe_load(verified_dag)
+                    original_parsed = yaml.load(original_dag_for_verification, Loader=SafeLoader)
+                    verified_parsed = yaml.load(verified_dag, Loader=SafeLoader)
                     
                     if original_parsed == verified_parsed:
                         logger.info("📝 DAG content identical, only format differs (YAML parsing matches)")
@@ -507,7 +499,7 @@ def run_notebook_agent(state: WorkflowState) -> Dict[str, Any]:
         logger.error("No DAG available for notebook generation")
         raise ValueError("No DAG available for notebook generation")
 
-    notebooks = notebook_agent(yaml.safe_load(dag_to_use), state["cleaned_code"], state["local_repo_path"])
+    notebooks = notebook_agent(yaml.load(dag_to_use, Loader=SafeLoader), state["cleaned_code"], state["local_repo_path"])
     logger.info(f"Generated {len(notebooks)} notebooks")
     return {"notebooks": notebooks}
 
@@ -631,6 +623,9 @@ STEPS = [
     ("create_pull_request", run_pr_creation)
 ]
 
+# Position of each step in STEPS, for resolving start_from and resume points by name
+STEP_INDEX = {step_name: i for i, (step_name, _) in enumerate(STEPS)}
+
 INITIAL_STATE = {
     # status related
     "step": "",
@@ -694,7 +689,7 @@ def run_workflow(github_url: str, input_files: List[str], run_id: str | None = N
     _, repo_name = parse_github_url(github_url)
     if not run_id:
         run_id = get_next_run_id(checkpoint_base_path=CHECKPOINT_BASE_PATH, repo_name=repo_name)
-    start_idx = 0 if not start_from else next(i for i, (s, _) in enumerate(STEPS) if s == start_from)
+    start_idx = 0 if not start_from else STEP_INDEX[start_from]
     step_name = STEPS[start_idx][0]
     status = "initializing"
 
@@ -714,10 +709,10 @@ def run_workflow(github_url: str, input_files: List[str], run_id: str | None = N
         logger.info(f"Using existing config path: {existing_config_path}")
 
     # Load state up to the start_from step
-    start_idx = 0 if not start_from else next(i for i, (step, _) in enumerate(STEPS) if step == start_from)
-    for step_name, _ in STEPS[:start_idx]:
-        logger.info(f"Loading previous step output: {step_name}")
-        step_output = load_step_output(checkpoint_base_path=CHECKPOINT_BASE_PATH, repo_name=repo_name, run_id=run_id, step=step_name)
+    previous_steps = [step_name for step_name, _ in STEPS[:start_idx]]
+    logger.info(f"Loading previous step outputs: {previous_steps}")
+    # Files are read in parallel but merged in step order, so later steps still override earlier ones
+    for step_output in load_step_outputs(checkpoint_base_path=CHECKPOINT_BASE_PATH, repo_name=repo_name, run_id=run_id, steps=previous_steps):
         state.update(step_output)
 
     # Run from start_from onward